@@ -49,11 +49,12 @@ class ActivationInfoReader:
             "eng_desc": "none",
         }
 
-    def create_activation_info_table(self, db_path: str, info_table_src: str) -> None:
-        with sqlite3.connect(db_path) as conn:
-            conn.execute("DROP TABLE IF EXISTS activation_info")
-            conn.execute(
-                """
+    def create_activation_info_table(
+        self, conn: sqlite3.Connection, info_table_src: str
+    ) -> None:
+        conn.execute("DROP TABLE IF EXISTS activation_info")
+        conn.execute(
+            """
 CREATE TABLE activation_info(
     flag TEXT PRIMARY KEY,
     level INTEGER,
@@ -64,9 +65,9 @@ CREATE TABLE activation_info(
     eng_desc TEXT
 )
 """
-            )
-            conn.executemany(
-                """
+        )
+        conn.executemany(
+            """
 INSERT INTO activation_info VALUES(
     :flag,
     :level,
@@ -77,5 +78,5 @@ INSERT INTO activation_info VALUES(
     :eng_desc
 )
 """,
-                self.get_activation_info_list(info_table_src),
-            )
+            self.get_activation_info_list(info_table_src),
+        )
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+from logging import getLogger
+from pathlib import Path
+from typing import Optional
+
+import ActivationInfoReader
+import ArtifactInfoReader
+import FlagInfoReader
+import KindInfoReader
+
+# DBのスキーマのバージョン。変更した場合は既存のDBからテーブルをコピーしない
+SCHEMA_VERSION = 1
+
+# 各ソースファイルから作成されるテーブル
+A_INFO_TABLES = ["a_info", "a_info_flags"]
+K_INFO_TABLES = ["k_info"]
+ACTIVATION_INFO_TABLES = ["activation_info"]
+
+
+def copy_tables(
+    conn: sqlite3.Connection, old_conn: sqlite3.Connection, tables: list[str]
+) -> bool:
+    """既存のDBからテーブルをインデックスごとコピーする
+
+    Args:
+        conn (sqlite3.Connection): コピー先のDBのコネクション
+        old_conn (sqlite3.Connection): コピー元のDBのコネクション
+        tables (list[str]): コピーするテーブル名のリスト
+
+    Returns:
+        bool: 全てのテーブルをコピーできた場合はTrue
+    """
+    for table in tables:
+        rows = old_conn.execute(
+            "SELECT type, sql FROM sqlite_master"
+            " WHERE tbl_name = ? AND sql IS NOT NULL"
+            " ORDER BY type = 'index'",
+            (table,),
+        ).fetchall()
+        if not rows or rows[0][0] != "table":
+            return False
+
+        conn.execute(rows[0][1])
+        cursor = old_conn.execute(f"SELECT * FROM {table}")
+        placeholders = ", ".join("?" * len(cursor.description))
+        conn.executemany(f"INSERT INTO {table} VALUES({placeholders})", cursor)
+        for _, sql in rows[1:]:
+            conn.execute(sql)
+    return True
+
+
+def build_artifact_db(
+    db_path: str,
+    flag_info_path: str,
+    a_info_txt: Optional[str] = None,
+    k_info_txt: Optional[str] = None,
+    activation_info_src: Optional[str] = None,
+) -> bool:
+    """アーティファクト情報のDBを作成し、既存のDBと置き換える
+
+    DBは一時ファイルに1つのトランザクションで作成し、完成してから
+    rename で既存のDBと置き換える。このため、既存のDBを読み込み中のコネクションが
+    作成途中のDBを参照することはない。置き換えた後、読み込み側は
+    コネクションを開き直す必要がある。
+
+    ソースファイルのテキストがNoneのテーブルは既存のDBからコピーする。
+    既存のDBが無いか、スキーマのバージョンが異なる場合は作成できない。
+
+    Args:
+        db_path (str): DBのパス
+        flag_info_path (str): flag_info.txt のパス
+        a_info_txt (Optional[str]): ArtifactDefinitions.jsonc の内容
+        k_info_txt (Optional[str]): BaseitemDefinitions.jsonc の内容
+        activation_info_src (Optional[str]): activation-info-table.cpp の内容
+
+    Returns:
+        bool: DBを置き換えた場合はTrue。既存のDBに無いテーブルがあり
+            作成できなかった場合はFalse
+    """
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    old_conn = None
+    if os.path.exists(db_path):
+        old_conn = sqlite3.connect(
+            f"{Path(db_path).absolute().as_uri()}?mode=ro", uri=True
+        )
+        (version,) = old_conn.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            old_conn.close()
+            old_conn = None
+
+    built = False
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        FlagInfoReader.FlagInfoReader().create_flag_info_table(conn, flag_info_path)
+
+        a_info_reader = ArtifactInfoReader.ArtifactInfoReader()
+        k_info_reader = KindInfoReader.KindInfoReader()
+        activation_info_reader = ActivationInfoReader.ActivationInfoReader()
+        sources = [
+            (k_info_txt, K_INFO_TABLES, k_info_reader.create_k_info_table),
+            (
+                activation_info_src,
+                ACTIVATION_INFO_TABLES,
+                activation_info_reader.create_activation_info_table,
+            ),
+            (a_info_txt, A_INFO_TABLES, a_info_reader.create_a_info_table),
+        ]
+        for text, tables, creator in sources:
+            if text is not None:
+                creator(conn, text)
+            elif old_conn is None or not copy_tables(conn, old_conn, tables):
+                getLogger(__name__).warning(
+                    f"Cannot build {db_path}: missing {', '.join(tables)}"
+                )
+                conn.execute("ROLLBACK")
+                return False
+
+        if a_info_txt is None:
+            # flag_info.txt が変わっている可能性があるので、ビットマスクを作り直す
+            a_info_reader.update_flag_masks(conn)
+
+        conn.execute("COMMIT")
+        built = True
+    finally:
+        conn.close()
+        if old_conn is not None:
+            old_conn.close()
+        if not built:
+            os.remove(tmp_path)
+
+    os.replace(tmp_path, db_path)
+    return True
@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from TextNormalizer import normalize
+
+
+class ArtifactFlagQueryError(Exception):
+    pass
+
+
+class FlagTable:
+    """フラグ名とビットマスクの対応表
+
+    フラグはフラグ名(RES_POIS)のほか、グループ名(CURSE)、
+    日本語の説明(「毒耐性」「耐性毒」、他と重複しなければ「反射」のような説明のみ)で指定できる。
+    グループを指定した場合は、グループのいずれかのフラグを表す。
+    """
+
+    def __init__(self, flags: Iterable[dict]):
+        """対応表を構築する
+
+        Args:
+            flags (Iterable[dict]): FlagInfoReader.get_flags が返すフラグの一覧
+        """
+        self.bits: Dict[str, int] = {}
+        self.group_masks: Dict[str, int] = {}
+        # 日本語の別名と、それが表すフラグ名またはグループ名の候補
+        self.aliases: Dict[str, List[str]] = {}
+
+        for flag in flags:
+            self.bits[flag["name"]] = flag["bit"]
+            self.group_masks[flag["flag_group"]] = self.group_masks.get(
+                flag["flag_group"], 0
+            ) | (1 << flag["bit"])
+
+            description = flag["description"]
+            group_description = flag["group_description"]
+            if group_description:
+                self.add_alias(group_description, flag["flag_group"])
+            if description and description != "-":
+                self.add_alias(description, flag["name"])
+                if group_description:
+                    self.add_alias(description + group_description, flag["name"])
+                    self.add_alias(group_description + description, flag["name"])
+
+    def add_alias(self, alias: str, name: str) -> None:
+        names = self.aliases.setdefault(normalize(alias), [])
+        if name not in names:
+            names.append(name)
+
+    def resolve(self, term: str) -> Tuple[int, bool]:
+        """フラグの指定をビットマスクに変換する
+
+        Args:
+            term (str): フラグ名、グループ名、または日本語の説明
+
+        Raises:
+            ArtifactFlagQueryError: 該当するフラグが無い、または1つに決まらない場合
+
+        Returns:
+            Tuple[int, bool]: ビットマスクと、それがグループ(いずれかのフラグ)かどうか
+        """
+        name = term.upper()
+        if name not in self.bits and name not in self.group_masks:
+            names = self.aliases.get(normalize(term), [])
+            if not names:
+                raise ArtifactFlagQueryError(f"フラグが不明です: {term}")
+            if len(names) > 1:
+                raise ArtifactFlagQueryError(
+                    f"フラグが特定できません: {term} ({', '.join(names)})"
+                )
+            name = names[0]
+
+        if name in self.bits:
+            return (1 << self.bits[name], False)
+        return (self.group_masks[name], True)
+
+
+@dataclass
+class ArtifactFlagQuery:
+    """アーティファクトのフラグ検索クエリ
+
+    "+RES_POIS +SPEED -CURSE" のような条件の並びを解析し、
+    フラグのビットマスクに対する条件を組み立てる。
+    """
+
+    # 全て持っていなければならないフラグ
+    required: int = 0
+    # それぞれ少なくとも1つ持っていなければならないフラグのグループ
+    required_any: List[int] = field(default_factory=list)
+    # 1つも持っていてはならないフラグ
+    excluded: int = 0
+
+    @classmethod
+    def parse(cls, tokens: List[str], flag_table: FlagTable) -> "ArtifactFlagQuery":
+        """条件の並びを解析する
+
+        Args:
+            tokens (List[str]): 条件の並び。先頭に + か何も付けなければ必須、- を付けると除外
+            flag_table (FlagTable): フラグの対応表
+
+        Raises:
+            ArtifactFlagQueryError: 解析できない条件が含まれていた場合
+
+        Returns:
+            ArtifactFlagQuery: 解析結果
+        """
+        query = cls()
+        for token in tokens:
+            exclude = token.startswith("-")
+            term = token.lstrip("+-")
+            if not term:
+                raise ArtifactFlagQueryError(f"条件を解析できません: {token}")
+
+            mask, is_group = flag_table.resolve(term)
+            if exclude:
+                query.excluded |= mask
+            elif is_group:
+                query.required_any.append(mask)
+            else:
+                query.required |= mask
+        return query
+
+    def matches(self, mask: int) -> bool:
+        return (
+            mask & self.required == self.required
+            and not mask & self.excluded
+            and all(mask & group for group in self.required_any)
+        )
+
+    def filter(self, masks: Sequence[int]) -> List[int]:
+        """条件に一致するビットマスクのインデックスを返す"""
+        return [i for i, mask in enumerate(masks) if self.matches(mask)]
@@ -2,7 +2,9 @@ import sqlite3
 from collections.abc import Iterable
 from dataclasses import asdict, dataclass, field
 from logging import getLogger
+from typing import Dict, List
 
+from FlagInfoReader import flags_to_mask, mask_to_bytes
 from Jsonc import parse_jsonc
 
 
@@ -86,12 +88,11 @@ class ArtifactInfoReader:
 
             yield a_info
 
-    def create_a_info_table(self, db_path: str, a_info_txt: str) -> None:
-        with sqlite3.connect(db_path) as conn:
-            conn.execute("DROP TABLE IF EXISTS a_info")
-            conn.execute("DROP TABLE IF EXISTS a_info_flags")
-            conn.execute(
-                """
+    def create_a_info_table(self, conn: sqlite3.Connection, a_info_txt: str) -> None:
+        conn.execute("DROP TABLE IF EXISTS a_info")
+        conn.execute("DROP TABLE IF EXISTS a_info_flags")
+        conn.execute(
+            """
 CREATE TABLE a_info(
     id INTEGER PRIMARY KEY,
     name TEXT,
@@ -112,56 +113,87 @@ CREATE TABLE a_info(
     is_melee_weapon BOOLEAN,
     range_weapon_mult INTEGER,
     is_protective_equipment BOOLEAN,
-    is_armor BOOLEAN
+    is_armor BOOLEAN,
+    flag_mask BLOB
 )
 """
-            )
-            conn.execute(
-                """
+        )
+        conn.execute(
+            """
 CREATE TABLE a_info_flags(
     id INTEGER,
     flag TEXT
 )
 """
-            )
-            conn.execute(
-                """
+        )
+        conn.execute(
+            """
 CREATE INDEX a_info_flags_index_id ON a_info_flags(id)
 """
-            )
+        )
 
-            a_info_flags = set()
-
-            for a_info in self.get_a_info_list(a_info_txt):
-                a_info_flags.update(a_info.flags)
-                conn.execute(
-                    f"""
+        a_info_list = list(self.get_a_info_list(a_info_txt))
+        conn.executemany(
+            """
 INSERT INTO a_info values(
     :id, :name, :english_name, :tval, :sval, :pval,
     :depth, :rarity, :weight, :cost,
     :base_ac, :base_dam, :to_hit, :to_dam, :to_ac,
     :activate_flag,
-    {a_info.is_melee_weapon},
-    {a_info.range_weapon_mult},
-    {a_info.is_protective_equipment},
-    {a_info.is_armor}
+    :is_melee_weapon,
+    :range_weapon_mult,
+    :is_protective_equipment,
+    :is_armor,
+    NULL
 )
 """,
-                    asdict(a_info),
-                )
-
-                for flag in a_info.flags:
-                    conn.execute(
-                        """
-INSERT INTO a_info_flags values(:id, :flag)
+            (
+                asdict(a_info)
+                | {
+                    "is_melee_weapon": a_info.is_melee_weapon,
+                    "range_weapon_mult": a_info.range_weapon_mult,
+                    "is_protective_equipment": a_info.is_protective_equipment,
+                    "is_armor": a_info.is_armor,
+                }
+                for a_info in a_info_list
+            ),
+        )
+        conn.executemany(
+            """
+INSERT INTO a_info_flags values(?, ?)
 """,
-                        {"id": a_info.id, "flag": flag},
-                    )
-
-            # flag_info.txt に登録されていないフラグのチェック
-            known_flags = {
-                row[0] for row in conn.execute("SELECT name FROM flag_info").fetchall()
-            }
-            if unknown_flags := a_info_flags - known_flags:
-                unknown_flags_str = ",".join(unknown_flags)
-                getLogger(__name__).warning(f"Unknown flag(s): {unknown_flags_str}")
+            ((a_info.id, flag) for a_info in a_info_list for flag in a_info.flags),
+        )
+
+        # flag_info.txt に登録されていないフラグのチェック
+        a_info_flags = {flag for a_info in a_info_list for flag in a_info.flags}
+        known_flags = {
+            row[0] for row in conn.execute("SELECT name FROM flag_info").fetchall()
+        }
+        if unknown_flags := a_info_flags - known_flags:
+            unknown_flags_str = ",".join(unknown_flags)
+            getLogger(__name__).warning(f"Unknown flag(s): {unknown_flags_str}")
+
+        self.update_flag_masks(conn)
+
+    def update_flag_masks(self, conn: sqlite3.Connection) -> None:
+        """a_info_flags と flag_info から a_info のフラグのビットマスクを設定する
+
+        ビット位置は flag_info に従うため、flag_info を作り直した時にも呼び出す。
+        flag_info.txt に登録されていないフラグは無視する。
+        """
+        # flag_info.txt に登録されているフラグと、ビットマスクでのビット位置
+        flag_bits = dict(conn.execute("SELECT name, bit FROM flag_info").fetchall())
+        flags: Dict[int, List[str]] = {
+            id: [] for (id,) in conn.execute("SELECT id FROM a_info").fetchall()
+        }
+        for id, flag in conn.execute("SELECT id, flag FROM a_info_flags").fetchall():
+            flags.setdefault(id, []).append(flag)
+
+        conn.executemany(
+            "UPDATE a_info SET flag_mask = ? WHERE id = ?",
+            (
+                (mask_to_bytes(flags_to_mask(f, flag_bits)), id)
+                for id, f in flags.items()
+            ),
+        )
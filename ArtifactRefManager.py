@@ -0,0 +1,238 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from logging import getLogger
+from typing import Callable, Dict, Generic, List, Optional, Protocol, TypeVar
+
+import aiohttp
+
+import DBConnectionPool
+
+
+class RefSpoiler(Protocol):
+    db_path: str
+    snapshot_path: str
+
+    @property
+    def artifacts(self) -> list: ...
+
+    async def check_for_updates(self, session: aiohttp.ClientSession) -> None: ...
+
+
+S = TypeVar("S", bound=RefSpoiler)
+
+
+class RefNotFoundError(Exception):
+    pass
+
+
+class ArtifactRefManager(Generic[S]):
+    """git の ref 毎のアーティファクトスポイラーを管理する
+
+    スポイラーは ref が初めて指定された時に作成する。
+    pinned_refs は起動時に作成して破棄しない。更新は polled_refs のみ常に確認し、
+    それ以外は最近使われた場合のみ確認する。
+    pinned_refs 以外の ref は最近使われた順に保持し、保持数やDBファイルの合計サイズが
+    上限を超えたら、最も長く使われていないものから破棄する。
+    タグのように内容が変わらない ref は、一度作成したら更新を確認しない。
+    ブランチのように内容が変わる ref は、最近使われたものだけ更新を確認する。
+    長く使われていなかったものは、次に使われた時に更新を確認してから返す。
+    """
+
+    DEFAULT_MAX_LOADED = 4
+    DEFAULT_MAX_DISK_BYTES = 100 * 1024 * 1024
+    DEFAULT_ACTIVE_SECONDS = 60 * 60
+    # 内容が変わらない ref (リリースタグ) とみなすパターン
+    DEFAULT_IMMUTABLE_PATTERN = r"v?\d+(\.\d+)+\S*"
+
+    # ref として受け付ける文字列
+    VALID_REF = re.compile(r"[A-Za-z0-9][A-Za-z0-9._/-]*")
+
+    def __init__(
+        self,
+        create_spoiler: Callable[[str], S],
+        pinned_refs: List[str],
+        max_loaded: int = DEFAULT_MAX_LOADED,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+        active_seconds: float = DEFAULT_ACTIVE_SECONDS,
+        immutable_pattern: str = DEFAULT_IMMUTABLE_PATTERN,
+        polled_refs: Optional[List[str]] = None,
+    ):
+        """インスタンスを生成する
+
+        Args:
+            create_spoiler (Callable[[str], S]): ref からスポイラーを作成する関数
+            pinned_refs (List[str]): 常に保持する ref
+            max_loaded (int, optional): pinned_refs 以外に保持する ref の最大数
+            max_disk_bytes (int, optional):
+                pinned_refs 以外のDBファイルの合計サイズの上限
+            active_seconds (float, optional):
+                最後に使われてからこの秒数の間は更新を確認する
+            immutable_pattern (str, optional): 内容が変わらない ref とみなすパターン
+            polled_refs (Optional[List[str]], optional):
+                使われていなくても更新を確認し続ける ref。省略時は pinned_refs
+        """
+        self.create_spoiler = create_spoiler
+        self.pinned_refs = pinned_refs
+        self.max_loaded = max_loaded
+        self.max_disk_bytes = max_disk_bytes
+        self.active_seconds = active_seconds
+        self.immutable_pattern = re.compile(immutable_pattern)
+        self.polled_refs = pinned_refs if polled_refs is None else polled_refs
+
+        self._spoilers: OrderedDict[str, S] = OrderedDict(
+            (ref, create_spoiler(ref)) for ref in pinned_refs
+        )
+        self._last_used: Dict[str, float] = {}
+        # スナップショットから読み込めたものは作成済みとして扱う
+        self._built: set[str] = {
+            ref for ref, spoiler in self._spoilers.items() if spoiler.artifacts
+        }
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def is_immutable(self, ref: str) -> bool:
+        return self.immutable_pattern.fullmatch(ref) is not None
+
+    def loaded(self, ref: str) -> Optional[S]:
+        """作成済みのスポイラーを返す。作成されていなければNoneを返す"""
+        if ref not in self._built:
+            return None
+        return self._spoilers.get(ref)
+
+    async def get(self, ref: str) -> S:
+        """ref のスポイラーを返す
+
+        作成されていなければ作成し、アーティファクト情報を読み込む。
+        内容の変わる ref で、使われていない間に定期的な更新の確認から
+        外れていた場合は、返す前に一度更新を確認する。
+
+        Args:
+            ref (str): ブランチ名またはタグ名
+
+        Raises:
+            RefNotFoundError: ref が不正か、アーティファクト情報を取得できなかった場合
+
+        Returns:
+            S: スポイラー
+        """
+        if self.VALID_REF.fullmatch(ref) is None or ".." in ref:
+            raise RefNotFoundError(f"不正なrefです: {ref}")
+
+        now = time.monotonic()
+        idle_seconds = now - self._last_used.get(ref, now)
+        self._last_used[ref] = now
+        lock = self._locks.setdefault(ref, asyncio.Lock())
+        try:
+            async with lock:
+                spoiler = self._spoilers.get(ref)
+                if spoiler is None:
+                    self._spoilers[ref] = spoiler = self.create_spoiler(ref)
+                    if spoiler.artifacts:
+                        self._built.add(ref)
+                else:
+                    self._spoilers.move_to_end(ref)
+
+                stale = (
+                    ref in self._built
+                    and ref not in self.polled_refs
+                    and not self.is_immutable(ref)
+                    and idle_seconds >= self.active_seconds
+                )
+                if ref not in self._built or stale:
+                    async with aiohttp.ClientSession() as session:
+                        await self._update(ref, spoiler, session)
+                    if ref not in self._built:
+                        if ref not in self.pinned_refs:
+                            await self.discard(ref)
+                        raise RefNotFoundError(
+                            f"refのアーティファクト情報がありません: {ref}"
+                        )
+                    await self.evict(keep=ref)
+        finally:
+            if ref not in self._spoilers and not lock.locked():
+                self._locks.pop(ref, None)
+
+        return spoiler
+
+    async def update(self, ref: str, session: aiohttp.ClientSession) -> None:
+        spoiler = self._spoilers.get(ref)
+        if spoiler is None:
+            return
+        async with self._locks.setdefault(ref, asyncio.Lock()):
+            await self._update(ref, spoiler, session)
+
+    async def _update(
+        self, ref: str, spoiler: S, session: aiohttp.ClientSession
+    ) -> None:
+        await spoiler.check_for_updates(session)
+        if spoiler.artifacts:
+            self._built.add(ref)
+
+    async def poll(self, session: aiohttp.ClientSession) -> None:
+        """更新を確認する
+
+        polled_refs と、まだ作成できていない pinned_refs、
+        最近使われた内容の変わる ref のみ確認する。
+        """
+        now = time.monotonic()
+        refs = [
+            ref
+            for ref in self._spoilers
+            if ref in self.polled_refs
+            or (ref in self.pinned_refs and ref not in self._built)
+            or (
+                ref in self._built
+                and not self.is_immutable(ref)
+                and now - self._last_used.get(ref, 0) < self.active_seconds
+            )
+        ]
+        await asyncio.gather(*[self.update(ref, session) for ref in refs])
+
+    async def evict(self, keep: Optional[str] = None) -> None:
+        """保持数やDBファイルのサイズの上限を超えた分の ref を破棄する
+
+        Args:
+            keep (Optional[str], optional): 破棄しない ref. Defaults to None.
+        """
+        while True:
+            unpinned = [ref for ref in self._spoilers if ref not in self.pinned_refs]
+            # 作成中や更新中のものは破棄しない
+            evictable = [
+                ref for ref in unpinned if ref != keep and not self._is_locked(ref)
+            ]
+            disk_bytes = sum(
+                os.path.getsize(path)
+                for ref in unpinned
+                for path in self.data_files(self._spoilers[ref])
+                if os.path.exists(path)
+            )
+            if not evictable or (
+                len(unpinned) <= self.max_loaded and disk_bytes <= self.max_disk_bytes
+            ):
+                return
+            # 最も長く使われていないものから破棄する
+            await self.discard(evictable[0])
+
+    @staticmethod
+    def data_files(spoiler: S) -> List[str]:
+        return [spoiler.db_path, spoiler.snapshot_path]
+
+    def _is_locked(self, ref: str) -> bool:
+        lock = self._locks.get(ref)
+        return lock is not None and lock.locked()
+
+    async def discard(self, ref: str) -> None:
+        spoiler = self._spoilers.pop(ref, None)
+        if spoiler is None:
+            return
+        self._built.discard(ref)
+        self._last_used.pop(ref, None)
+        if not self._is_locked(ref):
+            self._locks.pop(ref, None)
+        await DBConnectionPool.release_pool(spoiler.db_path)
+        for path in self.data_files(spoiler):
+            if os.path.exists(path):
+                os.remove(path)
+        getLogger(__name__).info(f"Discarded artifact spoiler for ref: {ref}")
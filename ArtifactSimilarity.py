@@ -0,0 +1,91 @@
+import heapq
+from typing import Dict, List, Sequence, Tuple
+
+
+class ArtifactSimilarity:
+    """アーティファクト同士の類似度を計算する
+
+    類似度は以下を重み付けして足し合わせたもの(0〜1)。
+
+    - フラグ: グループ毎に重みを付けた Jaccard 係数
+    - 修正値(pval, 命中, ダメージ, AC): 全アーティファクトでの値の幅で正規化した差
+    - 種別(tval): 一致するかどうか
+    """
+
+    FLAG_WEIGHT = 0.6
+    STAT_WEIGHT = 0.25
+    TVAL_WEIGHT = 0.15
+
+    STAT_KEYS = ["pval", "to_hit", "to_dam", "to_ac"]
+
+    # フラググループ毎の重み。指定の無いグループは1とする
+    GROUP_WEIGHTS = {"IGNORE": 0.0, "XTRA": 0.5}
+
+    def __init__(self, artifacts: Sequence[dict], group_masks: Dict[str, int]):
+        """類似度の計算に使用する値を準備する
+
+        Args:
+            artifacts (Sequence[dict]): アーティファクトのリスト。
+                flag_mask, tval, weight と STAT_KEYS の値を持つ
+            group_masks (Dict[str, int]): フラググループ名とそのビットマスクの対応
+        """
+        self.masks = [art["flag_mask"] for art in artifacts]
+        self.tvals = [art["tval"] for art in artifacts]
+        self.weights = [art["weight"] for art in artifacts]
+        self.stats = [[art[key] for key in self.STAT_KEYS] for art in artifacts]
+        self.ranges = [(max(col) - min(col)) or 1 for col in zip(*self.stats)]
+        self.weighted_groups: List[Tuple[int, float]] = [
+            (mask, self.GROUP_WEIGHTS.get(name, 1.0))
+            for name, mask in group_masks.items()
+            if self.GROUP_WEIGHTS.get(name, 1.0) > 0
+        ]
+
+    def weighted_count(self, mask: int) -> float:
+        return sum(
+            (mask & group).bit_count() * weight
+            for group, weight in self.weighted_groups
+        )
+
+    def similarity(self, i: int, j: int) -> float:
+        """i番目とj番目のアーティファクトの類似度を返す"""
+        union = self.weighted_count(self.masks[i] | self.masks[j])
+        flag_sim = (
+            self.weighted_count(self.masks[i] & self.masks[j]) / union if union else 1.0
+        )
+
+        stat_sim = sum(
+            1 - min(abs(a - b) / r, 1.0)
+            for a, b, r in zip(self.stats[i], self.stats[j], self.ranges)
+        ) / len(self.STAT_KEYS)
+
+        tval_sim = 1.0 if self.tvals[i] == self.tvals[j] else 0.0
+
+        return (
+            self.FLAG_WEIGHT * flag_sim
+            + self.STAT_WEIGHT * stat_sim
+            + self.TVAL_WEIGHT * tval_sim
+        )
+
+    def most_similar(
+        self, target: int, limit: int = 10, lighter: bool = False
+    ) -> List[Tuple[int, float]]:
+        """targetに似たアーティファクトを返す
+
+        Args:
+            target (int): 基準とするアーティファクトのインデックス
+            limit (int, optional): 返す最大件数. Defaults to 10.
+            lighter (bool, optional): 基準より軽いものに限る. Defaults to False.
+
+        Returns:
+            List[Tuple[int, float]]: (インデックス, 類似度)を類似度の高い順に並べたリスト
+        """
+        candidates = (
+            i
+            for i in range(len(self.masks))
+            if i != target and (not lighter or self.weights[i] < self.weights[target])
+        )
+        return heapq.nlargest(
+            limit,
+            ((i, self.similarity(target, i)) for i in candidates),
+            key=lambda r: r[1],
+        )
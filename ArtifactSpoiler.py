@@ -1,39 +1,142 @@
 import asyncio
 import os
-from collections.abc import Iterable
-from typing import Dict, List, Optional
+import re
+import time
+import urllib.parse
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Dict, List, Optional, Tuple
 
 import aiohttp
 import aiosqlite
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
 
-import ActivationInfoReader
-import ArtifactInfoReader
+import ArtifactDBBuilder
+import DBConnectionPool
 import FlagInfoReader
-import KindInfoReader
+import HttpCache
+import IngestWorkerPool
 import ListSearch
+import Snapshot
+from ArtifactFlagQuery import ArtifactFlagQuery, ArtifactFlagQueryError, FlagTable
+from ArtifactRefManager import ArtifactRefManager, RefNotFoundError
+from ArtifactSimilarity import ArtifactSimilarity
 from ErrorCatchingArgumentParser import ErrorCatchingArgumentParser
+from RenderCache import RenderCache
+from RevisionProbe import RevisionProbe, create_revision_probe
+from SearchIndex import SearchIndex
+from SingleFlight import SingleFlight
+from TextNormalizer import normalize
+from utils import LatencyStats, Record, limit_str_length, page_count
+
+
+@dataclass(frozen=True, slots=True)
+class ArtifactRecord(Record):
+    """検索・一覧表示用にメモリに保持するアーティファクト情報"""
+
+    id: int
+    fullname: str
+    fullname_en: str
+    # フラグのビットマスク
+    flag_mask: int
+    tval: int
+    weight: int
+    pval: int
+    to_hit: int
+    to_dam: int
+    to_ac: int
 
 
 class ArtifactSpoiler(commands.Cog):
-    def __init__(self, base_url: str, db_path: str):
+    # スナップショットに保存するデータの構造のバージョン
+    SNAPSHOT_VERSION = 1
+
+    def __init__(
+        self,
+        base_url: str,
+        db_path: str,
+        render_cache_size: int = RenderCache.DEFAULT_MAX_SIZE,
+        render_cache_warmup: bool = False,
+        revision_probe: Optional[RevisionProbe] = None,
+        ref: str = "",
+        http_cache: Optional[HttpCache.HttpCache] = None,
+        external_updater: bool = False,
+    ):
         self.base_url = base_url
         self.db_path = db_path
-        self.etags: Dict[str, str] = {}
-
-        FlagInfoReader.FlagInfoReader().create_flag_info_table(
-            db_path,
-            os.path.join(os.path.dirname(os.path.abspath(__file__)), "flag_info.txt"),
+        self.snapshot_path = f"{db_path}.snapshot"
+        # Trueの場合は updater.py がDBを作成し、DBが置き換えられたら読み込み直す
+        self.external_updater = external_updater
+        self.revision_probe = revision_probe
+        self.ref = ref
+        # 最後に更新を確認した時の upstream のリビジョン
+        self.revision: Optional[str] = None
+        self.http_cache = http_cache or HttpCache.get_cache()
+        self.ingest_pool = IngestWorkerPool.get_pool()
+        # 読み込んだDBファイルの inode と更新時刻
+        self.dataset_version = ""
+        self.render_cache: RenderCache[tuple[str, str]] = RenderCache(render_cache_size)
+        self.render_cache_warmup = render_cache_warmup
+
+        self.flag_info_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "flag_info.txt"
+        )
+        self.flag_table = FlagTable(
+            FlagInfoReader.FlagInfoReader().get_flags(self.flag_info_path)
         )
+        self.pool = DBConnectionPool.get_pool(db_path)
 
-        self._artifacts: List[Dict] = []
+        self._artifacts: List[ArtifactRecord] = []
+        # _artifacts と同じ順に並べたフラグのビットマスク
+        self._flag_masks: List[int] = []
+        self._similarity = ArtifactSimilarity([], self.flag_table.group_masks)
+        self._artifact_positions: Dict[int, int] = {}
+        self._search_index = SearchIndex([], "fullname", "fullname_en")
 
     @property
     def artifacts(self):
         return self._artifacts
 
-    async def load_artifacts(self) -> List[Dict]:
+    @property
+    def search_index(self) -> SearchIndex:
+        return self._search_index
+
+    def query_artifacts(self, query: ArtifactFlagQuery) -> List[ArtifactRecord]:
+        """フラグの条件に一致するアーティファクトを返す
+
+        Args:
+            query (ArtifactFlagQuery): フラグの条件
+
+        Returns:
+            List[ArtifactRecord]: 条件に一致するアーティファクトのリスト
+        """
+        artifacts = self._artifacts
+        return [artifacts[i] for i in query.filter(self._flag_masks)]
+
+    def similar_artifacts(
+        self, art: ArtifactRecord, limit: int, lighter: bool = False
+    ) -> List[Tuple[ArtifactRecord, float]]:
+        """artに似たアーティファクトを返す
+
+        Args:
+            art (ArtifactRecord): 基準とするアーティファクト
+            limit (int): 返す最大件数
+            lighter (bool, optional): artより軽いものに限る. Defaults to False.
+
+        Returns:
+            List[Tuple[ArtifactRecord, float]]: (アーティファクト, 類似度)を類似度の高い順に並べたリスト
+        """
+        if (position := self._artifact_positions.get(art["id"])) is None:
+            return []
+        artifacts = self._artifacts
+        return [
+            (artifacts[i], score)
+            for i, score in self._similarity.most_similar(position, limit, lighter)
+        ]
+
+    async def load_artifacts(self) -> List[ArtifactRecord]:
 
         def fullname(art: aiosqlite.Row):
             a = art["a_name"]
@@ -50,8 +153,7 @@ class ArtifactSpoiler(commands.Cog):
             f = a if art["is_fullname"] else f"{k} {a}"
             return f.replace("&", "The").replace("~", "")
 
-        async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = aiosqlite.Row
+        async with self.pool.connection() as conn:
             async with conn.execute(
                 """
 SELECT
@@ -68,7 +170,14 @@ SELECT
         WHERE
             a_info_flags.id = a_info.id
             AND a_info_flags.flag = 'FULL_NAME'
-    ) AS is_fullname
+    ) AS is_fullname,
+    a_info.flag_mask AS flag_mask,
+    a_info.tval AS tval,
+    a_info.weight AS weight,
+    a_info.pval AS pval,
+    a_info.to_hit AS to_hit,
+    a_info.to_dam AS to_dam,
+    a_info.to_ac AS to_ac
 FROM
     a_info
     JOIN k_info ON a_info.tval = k_info.tval
@@ -76,46 +185,94 @@ FROM
 """
             ) as c:
                 return [
-                    {
-                        "id": art["id"],
-                        "fullname": fullname(art),
-                        "fullname_en": fullname_en(art),
-                    }
+                    ArtifactRecord(
+                        id=art["id"],
+                        fullname=fullname(art),
+                        fullname_en=fullname_en(art),
+                        flag_mask=FlagInfoReader.mask_from_bytes(art["flag_mask"]),
+                        **{
+                            key: art[key]
+                            for key in ["tval", "weight", *ArtifactSimilarity.STAT_KEYS]
+                        },
+                    )
                     for art in await c.fetchall()
                 ]
 
-    async def describe_artifact(self, art: Dict):
-        async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = aiosqlite.Row
-            async with conn.execute(
-                """
+    async def describe_artifact(self, art: ArtifactRecord) -> tuple[str, str]:
+        return (await self.describe_artifacts([art]))[0]
+
+    async def describe_artifacts(
+        self, arts: List[ArtifactRecord]
+    ) -> List[tuple[str, str]]:
+        """アーティファクトの表示内容をまとめて組み立てる
+
+        キャッシュに無いものの情報は1回のDBアクセスでまとめて取得する。
+
+        Args:
+            arts (List[ArtifactRecord]): 表示するアーティファクトのリスト
+
+        Returns:
+            List[tuple[str, str]]: artsの順に並べた(見出し, 詳細)のリスト
+        """
+        version = self.dataset_version
+        descs = {art["id"]: self.render_cache.get(art["id"], version) for art in arts}
+        missing = [art for art in arts if descs[art["id"]] is None]
+        if missing:
+            a_infos, flags = await self.fetch_artifact_rows(
+                [art["id"] for art in missing]
+            )
+            for art in missing:
+                desc = self.build_artifact_description(
+                    art, a_infos.get(art["id"]), flags.get(art["id"], [])
+                )
+                self.render_cache.put(art["id"], version, desc)
+                descs[art["id"]] = desc
+        return [descs[art["id"]] for art in arts]
+
+    async def fetch_artifact_rows(
+        self, ids: List[int]
+    ) -> tuple[Dict[int, aiosqlite.Row], Dict[int, List[aiosqlite.Row]]]:
+        placeholders = ", ".join("?" * len(ids))
+        async with self.pool.connection() as conn:
+            a_infos = await conn.execute_fetchall(
+                f"""
 SELECT
     *
 FROM
     a_info
     JOIN activation_info ON a_info.activate_flag = activation_info.flag
 WHERE
-    a_info.id = :id
+    a_info.id IN ({placeholders})
 """,
-                {"id": art["id"]},
-            ) as c:
-                a_info = await c.fetchone()
+                ids,
+            )
             flags = await conn.execute_fetchall(
-                """
+                f"""
 SELECT
     *
 FROM
     a_info_flags
     JOIN flag_info ON a_info_flags.flag = flag_info.name
 WHERE
-    a_info_flags.id = :id
+    a_info_flags.id IN ({placeholders})
 ORDER BY
     flag_group,
     id_in_group
 """,
-                {"id": art["id"]},
+                ids,
             )
 
+        flags_by_id: Dict[int, List[aiosqlite.Row]] = {}
+        for flag in flags:
+            flags_by_id.setdefault(flag["id"], []).append(flag)
+        return ({a_info["id"]: a_info for a_info in a_infos}, flags_by_id)
+
+    def build_artifact_description(
+        self,
+        art: ArtifactRecord,
+        a_info: Optional[aiosqlite.Row],
+        flags: List[aiosqlite.Row],
+    ) -> tuple[str, str]:
         main = f"[{art['id']}] ★{art['fullname']}"
         if not a_info:
             return (main, "詳細情報が見つかりませんでした")
@@ -128,18 +285,25 @@ ORDER BY
 
         main += f" / {art['fullname_en']}"
 
-        detail = self.describe_flag_group(flags, f"{a_info['pval']:+}の修正: ", "BONUS")
-        detail += self.describe_flag_group(flags, "対: ", "SLAYING")
-        detail += self.describe_flag_group(flags, "武器属性: ", "BRAND")
-        detail += self.describe_flag_group(flags, "免疫: ", "IMMUNITY")
-        detail += self.describe_flag_group(flags, "耐性: ", "RESISTANCE")
-        detail += self.describe_flag_group(flags, "弱点: ", "VULNERABILITY")
-        detail += self.describe_flag_group(flags, "維持: ", "SUSTAIN_STATUS")
-        detail += self.describe_flag_group(flags, "感知: ", "ESP")
-        detail += self.describe_flag_group(flags, "", "POWER")
-        detail += self.describe_flag_group(flags, "", "MISC")
-        detail += self.describe_flag_group(flags, "", "CURSE")
-        detail += self.describe_flag_group(flags, "追加: ", "XTRA")
+        # フラグはflag_group順に並んでいるので、グループ毎にまとめておく
+        flag_groups: Dict[str, List[str]] = {}
+        for flag in flags:
+            flag_groups.setdefault(flag["flag_group"], []).append(flag["description"])
+
+        detail = self.describe_flag_group(
+            flag_groups, f"{a_info['pval']:+}の修正: ", "BONUS"
+        )
+        detail += self.describe_flag_group(flag_groups, "対: ", "SLAYING")
+        detail += self.describe_flag_group(flag_groups, "武器属性: ", "BRAND")
+        detail += self.describe_flag_group(flag_groups, "免疫: ", "IMMUNITY")
+        detail += self.describe_flag_group(flag_groups, "耐性: ", "RESISTANCE")
+        detail += self.describe_flag_group(flag_groups, "弱点: ", "VULNERABILITY")
+        detail += self.describe_flag_group(flag_groups, "維持: ", "SUSTAIN_STATUS")
+        detail += self.describe_flag_group(flag_groups, "感知: ", "ESP")
+        detail += self.describe_flag_group(flag_groups, "", "POWER")
+        detail += self.describe_flag_group(flag_groups, "", "MISC")
+        detail += self.describe_flag_group(flag_groups, "", "CURSE")
+        detail += self.describe_flag_group(flag_groups, "追加: ", "XTRA")
         detail += self.describe_activation(a_info)
         detail += "\n"
         detail += (
@@ -170,21 +334,11 @@ ORDER BY
         return res
 
     def describe_flag_group(
-        self, flags: Iterable[aiosqlite.Row], head: str, group_name: str
+        self, flag_groups: Dict[str, List[str]], head: str, group_name: str
     ):
-        if group_name not in [flag["flag_group"] for flag in flags]:
+        if group_name not in flag_groups:
             return ""
-        return (
-            f"{head}"
-            + ", ".join(
-                [
-                    flag["description"]
-                    for flag in flags
-                    if flag["flag_group"] == group_name
-                ]
-            )
-            + "\n "
-        )
+        return f"{head}" + ", ".join(flag_groups[group_name]) + "\n "
 
     def describe_activation(self, a_info: aiosqlite.Row):
         if a_info["activate_flag"] == "NONE":
@@ -209,81 +363,290 @@ ORDER BY
         return DICT.get(flag, "不明")
 
     async def download_file(
-        self, session: aiohttp.ClientSession, filepath: str
+        self, session: aiohttp.ClientSession, filepath: str, revalidate: bool
     ) -> Optional[str]:
-        url = f"{self.base_url}/{filepath}"
-        async with session.get(
-            url, headers={"if-none-match": self.etags.get(filepath, "")}
-        ) as res:
-            if res.status != 200:
-                return None
-            self.etags[filepath] = res.headers.get("etag", "")
-            return await res.text()
+        result = await self.http_cache.fetch(
+            session, f"{self.base_url}/{filepath}", revalidate=revalidate
+        )
+        if not result.modified:
+            return None
+        return result.text
 
     async def check_for_updates(self, session: aiohttp.ClientSession) -> None:
+        start = time.perf_counter()
+        if not self.external_updater:
+            await self.update_db(session)
+        if await self.reload_if_replaced():
+            getLogger(__name__).info(
+                f"Artifact info ({self.ref}) refreshed in"
+                f" {time.perf_counter() - start:.2f}s"
+            )
+
+    async def update_db(self, session: aiohttp.ClientSession) -> None:
+        """ファイルが更新されていれば、ダウンロードしてDBを作り直す"""
         file_list = [
             "lib/edit/ArtifactDefinitions.jsonc",
             "lib/edit/BaseitemDefinitions.jsonc",
             "src/object-enchant/activation-info-table.cpp",
         ]
-        updaters = [
-            ArtifactInfoReader.ArtifactInfoReader().create_a_info_table,
-            KindInfoReader.KindInfoReader().create_k_info_table,
-            ActivationInfoReader.ActivationInfoReader().create_activation_info_table,
-        ]
+
+        # リビジョンが変わっていなければ、ファイルを取得せずに済ませる
+        # 取得できなかった場合は etag によるファイル毎の確認にフォールバックする
+        revision = None
+        if self.revision_probe is not None:
+            revision = await self.revision_probe.fetch(session, self.ref)
+            if revision is not None and revision == self.revision and self._artifacts:
+                return
+
+        # DBが無ければ検証子は使わずに全ファイルを取得する
+        revalidate = os.path.exists(self.db_path)
         downloaded_files = await asyncio.gather(
-            *[self.download_file(session, f) for f in file_list]
+            *[self.download_file(session, f, revalidate) for f in file_list]
+        )
+
+        if any(downloaded_files):
+            built = False
+            try:
+                # パースとDBの作成はワーカープロセスで行い、DBファイルを直接書き込む
+                built = await self.ingest_pool.run(
+                    ArtifactDBBuilder.build_artifact_db,
+                    self.db_path,
+                    self.flag_info_path,
+                    *[text or None for text in downloaded_files],
+                )
+            finally:
+                if not built:
+                    # DBを作成できなかったので、次回は全ファイルを取得し直す
+                    for f in file_list:
+                        await self.http_cache.forget(f"{self.base_url}/{f}")
+            if not built:
+                return
+
+        if os.path.exists(self.db_path):
+            self.revision = revision
+
+    def current_db_stamp(self) -> Optional[str]:
+        """DBファイルの inode と更新時刻を返す。DBが無ければNoneを返す
+
+        DBファイルは rename で置き換えるので、これが変わればDBが作り直されている。
+        """
+        try:
+            st = os.stat(self.db_path)
+        except FileNotFoundError:
+            return None
+        return f"{st.st_ino}-{st.st_mtime_ns}"
+
+    async def reload_if_replaced(self) -> bool:
+        """DBファイルが置き換えられていれば、アーティファクト情報を読み込み直す
+
+        Returns:
+            bool: 読み込み直した場合はTrue
+        """
+        stamp = self.current_db_stamp()
+        if stamp is None or stamp == self.dataset_version:
+            return False
+
+        # DBを置き換えたので、プールしているコネクションを入れ替える
+        await self.pool.reset()
+        await self.load_dataset(stamp)
+        self.save_snapshot()
+        return True
+
+    def set_artifacts(
+        self,
+        artifacts: List[ArtifactRecord],
+        search_index: SearchIndex,
+        dataset_version: str,
+    ) -> None:
+        self._artifacts = artifacts
+        self._flag_masks = [art["flag_mask"] for art in artifacts]
+        self._similarity = ArtifactSimilarity(artifacts, self.flag_table.group_masks)
+        self._artifact_positions = {art["id"]: i for i, art in enumerate(artifacts)}
+        self._search_index = search_index
+        self.dataset_version = dataset_version
+        self.render_cache.clear()
+
+    async def load_dataset(self, dataset_version: str) -> None:
+        """DBからアーティファクト情報を読み込み、検索用のデータを作り直す"""
+        artifacts = await self.load_artifacts()
+        self.set_artifacts(
+            artifacts,
+            SearchIndex(artifacts, "fullname", "fullname_en"),
+            dataset_version,
+        )
+        if self.render_cache_warmup:
+            await self.warm_up_render_cache()
+
+    def load_snapshot(self) -> None:
+        """前回の起動時に保存したスナップショットからアーティファクト情報を読み込む
+
+        DBからの読み込みと検索インデックスの作成を待たずに検索できるようにする。
+        スナップショットを保存した後にDBが置き換えられている場合は使わない。
+        """
+        try:
+            snapshot = Snapshot.load(self.snapshot_path, self.SNAPSHOT_VERSION)
+        except OSError as e:
+            getLogger(__name__).warning(f"Failed to load snapshot: {e}")
+            return
+        if snapshot is None or snapshot["dataset_version"] != self.current_db_stamp():
+            return
+        search_index: SearchIndex = snapshot["search_index"]
+        self.set_artifacts(
+            search_index.items, search_index, snapshot["dataset_version"]
+        )
+        getLogger(__name__).info(
+            f"Loaded {len(self._artifacts)} artifacts ({self.ref}) from snapshot"
         )
 
-        for text, updater in zip(downloaded_files, updaters):
-            if text:
-                loop = asyncio.get_running_loop()
-                await loop.run_in_executor(None, updater, self.db_path, text)
+    def save_snapshot(self) -> None:
+        snapshot = {
+            "dataset_version": self.dataset_version,
+            "search_index": self._search_index,
+        }
+        try:
+            Snapshot.save(self.snapshot_path, snapshot, self.SNAPSHOT_VERSION)
+        except OSError as e:
+            getLogger(__name__).warning(f"Failed to save snapshot: {e}")
 
-        if any(downloaded_files) or not self._artifacts:
-            # file_listのいずれかのファイルが更新されている、もしくはアーティファクト情報が
-            # 未ロードなら、アーティファクト情報を読み込む
-            self._artifacts = await self.load_artifacts()
+    async def warm_up_render_cache(self) -> None:
+        """全アーティファクトの表示内容を事前に組み立ててキャッシュに格納する"""
+        self.render_cache.reserve(len(self._artifacts))
+        await self.describe_artifacts(self._artifacts)
 
     def output_test(self):
         for art in self._artifacts:
             print(self.describe_artifact(art))
 
 
+def create_spoiler(
+    config: dict, ref: str, external_updater: bool = False
+) -> ArtifactSpoiler:
+    """設定から ref のスポイラーを生成する
+
+    botと updater.py で同じDBを使うため、両方からこの関数で生成する。
+    """
+    return ArtifactSpoiler(
+        f"{config['hengband_src_url']}/{ref}",
+        os.path.join(
+            os.path.expanduser(config["db_dir"]),
+            # ref ごとに別のファイル名になるよう、'/' なども含めてエスケープする
+            f"art-info-{urllib.parse.quote(ref, safe='')}.db",
+        ),
+        config.get("render_cache_size", RenderCache.DEFAULT_MAX_SIZE),
+        config.get("render_cache_warmup", False),
+        create_revision_probe(config),
+        ref,
+        HttpCache.get_cache(
+            config.get("http_cache_path", HttpCache.DEFAULT_CACHE_PATH)
+        ),
+        external_updater,
+    )
+
+
 class ArtifactSpoilerCog(commands.Cog):
     BRANCHES = ["master", "develop"]
+    # 使われていなくても更新を確認し続けるブランチ
+    # develop は常に保持するが、他の ref と同様に最近使われた場合のみ更新を確認する
+    POLLED_BRANCHES = ["master"]
+    QUERY_PAGE_SIZE = 20
+    # $artq で値を続けて書いたオプション(--page=2, --ref=3.0.0, -p2)
+    QUERY_OPTION_WITH_VALUE = re.compile(r"--(?:page|ref)=.*|-p\d+")
+    SIMILAR_LIMIT = 10
+    # updater.py が更新する場合に、DBの置き換えを確認する間隔
+    EXTERNAL_POLL_SECONDS = 10
 
     def __init__(self, bot: commands.Command, config: dict):
         self.bot = bot
-
-        self.spoilers: Dict[str, ArtifactSpoiler] = {}
-        for branch in self.BRANCHES:
-            base_url = f"{config['hengband_src_url']}/{branch}"
-            db_path = os.path.join(
-                os.path.expanduser(config["db_dir"]), f"art-info-{branch}.db"
+        self.http_cache = HttpCache.get_cache(
+            config.get("http_cache_path", HttpCache.DEFAULT_CACHE_PATH)
+        )
+        # Trueの場合、master と develop は updater.py が更新する
+        # それ以外の ref は従来どおり指定された時にbotが作成する
+        external_updater = config.get("external_updater", False)
+
+        # master と develop は常に保持し、それ以外の ref は指定された時に作成する
+        def create_ref_spoiler(ref: str) -> ArtifactSpoiler:
+            spoiler = create_spoiler(
+                config, ref, external_updater and ref in self.BRANCHES
+            )
+            # 前回の起動時のスナップショットがあれば、更新の確認を待たずに検索できる
+            spoiler.load_snapshot()
+            return spoiler
+
+        self.refs: ArtifactRefManager[ArtifactSpoiler] = ArtifactRefManager(
+            create_ref_spoiler,
+            self.BRANCHES,
+            config.get(
+                "artifact_refs_max_loaded", ArtifactRefManager.DEFAULT_MAX_LOADED
+            ),
+            config.get(
+                "artifact_refs_max_disk_mb",
+                ArtifactRefManager.DEFAULT_MAX_DISK_BYTES // (1024 * 1024),
             )
-            self.spoilers[branch] = ArtifactSpoiler(base_url, db_path)
+            * 1024
+            * 1024,
+            config.get(
+                "artifact_refs_active_seconds",
+                ArtifactRefManager.DEFAULT_ACTIVE_SECONDS,
+            ),
+            config.get(
+                "artifact_immutable_ref_pattern",
+                ArtifactRefManager.DEFAULT_IMMUTABLE_PATTERN,
+            ),
+            self.POLLED_BRANCHES,
+        )
+        self.mark_data_ready()
 
         self.parser = ErrorCatchingArgumentParser(prog="art", add_help=False)
         self.parser.add_argument("-d", "--develop", action="store_true")
+        self.parser.add_argument("-r", "--ref")
         self.parser.add_argument("-e", "--english", action="store_true")
-        self.parser.add_argument("artifact_name")
+        self.parser.add_argument("artifact_name", nargs="+")
+
+        # フラグの除外指定(-CURSE)をオプションとして解釈しないよう、
+        # オプションは art_query で取り出してからこのパーサーに渡す
+        self.query_parser = ErrorCatchingArgumentParser(
+            prog="artq", add_help=False, allow_abbrev=False
+        )
+        self.query_parser.add_argument("-d", "--develop", action="store_true")
+        self.query_parser.add_argument("-r", "--ref")
+        self.query_parser.add_argument("-p", "--page", type=int, default=1)
+
+        self.like_parser = ErrorCatchingArgumentParser(prog="artlike", add_help=False)
+        self.like_parser.add_argument("-d", "--develop", action="store_true")
+        self.like_parser.add_argument("-r", "--ref")
+        self.like_parser.add_argument("-e", "--english", action="store_true")
+        self.like_parser.add_argument("-l", "--lighter", action="store_true")
+        self.like_parser.add_argument("artifact_name", nargs="+")
+
+        self.autocomplete_stats = LatencyStats()
+        self.lookups: SingleFlight[ListSearch.SearchResult] = SingleFlight(
+            config.get("lookup_hold_seconds", SingleFlight.DEFAULT_HOLD_SECONDS)
+        )
 
+        if external_updater:
+            self.checker_task.change_interval(
+                seconds=config.get(
+                    "external_updater_poll_seconds", self.EXTERNAL_POLL_SECONDS
+                )
+            )
         self.checker_task.start()
 
-    @commands.command(usage="[-e] artifact_name")
+    @commands.command(usage="[-d | -r REF] [-e] artifact_name")
     async def art(self, ctx: commands.Context, *args):
         """アーティファクトを検索する
 
         アーティファクトを名称の一部で検索し、情報を表示します。
         複数のアーティファクトが見つかった場合は候補を表示し、リアクションで選択します。
         一件もヒットしなかった場合は、あいまい検索により候補を表示します。
+        名称を「,」か「、」で区切ると、複数のアーティファクトをまとめて表示します。
 
         positional arguments:
           artifact_name         検索するアーティファクトの名称の一部
 
         optional arguments:
           -d, --develop         開発(develop)ブランチを検索する
+          -r REF, --ref REF     指定したブランチまたはタグ(例: 3.0.0)を検索する
           -e, --english         英語名で検索する
         """
 
@@ -293,33 +656,284 @@ class ArtifactSpoilerCog(commands.Cog):
             await ctx.send_help(ctx.command)
             return
 
-        spoiler = (
-            self.spoilers["develop"]
-            if parse_result.develop
-            else self.spoilers["master"]
+        await self.search_artifact(
+            ctx,
+            self.select_ref(parse_result.ref, parse_result.develop),
+            " ".join(parse_result.artifact_name),
+            parse_result.english,
         )
 
-        await ListSearch.search(
+    @commands.command(usage="[-d | -r REF] [-p PAGE] flag [flag ...]")
+    async def artq(self, ctx: commands.Context, *args):
+        """フラグを指定してアーティファクトを検索する
+
+        指定したフラグの条件に一致するアーティファクトを一覧表示します。
+        例: $artq +RES_POIS +SPEED -CURSE
+
+        positional arguments:
+          flag                  フラグの条件。以下の形式で指定する
+                                  +フラグ  フラグを持つ(+は省略可)
+                                  -フラグ  フラグを持たない
+                                フラグはフラグ名(RES_POIS)、グループ名(CURSE)、
+                                日本語の説明(毒耐性)のいずれかで指定する
+                                グループ名はグループのいずれかのフラグを表す
+
+        optional arguments:
+          -d, --develop         開発(develop)ブランチを検索する
+          -r REF, --ref REF     指定したブランチまたはタグ(例: 3.0.0)を検索する
+          -p PAGE, --page PAGE  表示するページ
+        """
+
+        # -RES_POIS のような条件を argparse に渡すと、小文字で指定された場合に
+        # -r などのオプションと区別できないため、オプションはここで取り出す
+        options, conditions = [], []
+        arg_iter = iter(args)
+        for arg in arg_iter:
+            if arg in ("-d", "--develop"):
+                options.append(arg)
+            elif arg in ("-p", "--page", "-r", "--ref"):
+                options += [arg, next(arg_iter, "")]
+            elif self.QUERY_OPTION_WITH_VALUE.fullmatch(arg):
+                options.append(arg)
+            else:
+                conditions.append(arg)
+
+        try:
+            parse_result = self.query_parser.parse_args(options)
+            if not conditions:
+                raise ValueError("no conditions")
+        except Exception:
+            await ctx.send_help(ctx.command)
+            return
+
+        spoiler = await self.get_spoiler(
+            ctx, self.select_ref(parse_result.ref, parse_result.develop)
+        )
+        if spoiler is None:
+            return
+
+        try:
+            query = ArtifactFlagQuery.parse(conditions, spoiler.flag_table)
+        except ArtifactFlagQueryError as e:
+            await self.send_error(ctx, str(e))
+            return
+
+        arts = spoiler.query_artifacts(query)
+        if not arts:
+            await self.send_error(ctx, "条件に一致するアーティファクトはありません")
+            return
+
+        page = max(parse_result.page, 1)
+        offset = (page - 1) * self.QUERY_PAGE_SIZE
+        lines = [
+            f"[{art['id']}] ★{art['fullname']} / {art['fullname_en']}"
+            for art in arts[offset : offset + self.QUERY_PAGE_SIZE]
+        ]
+        embed = discord.Embed(
+            title=f"検索結果: {len(arts)} 件"
+            f" ({page}/{page_count(len(arts), self.QUERY_PAGE_SIZE)} ページ)",
+            description=discord.utils.escape_markdown(
+                limit_str_length("\n".join(lines), 4096)
+            ),
+        )
+        await ctx.reply(embed=embed)
+
+    @commands.command(usage="[-d | -r REF] [-e] [-l] artifact_name")
+    async def artlike(self, ctx: commands.Context, *args):
+        """似たアーティファクトを検索する
+
+        指定したアーティファクトとフラグ・修正値・種別が似ているアーティファクトを
+        似ている順に表示します。
+
+        positional arguments:
+          artifact_name         基準とするアーティファクトの名称の一部
+
+        optional arguments:
+          -d, --develop         開発(develop)ブランチを検索する
+          -r REF, --ref REF     指定したブランチまたはタグ(例: 3.0.0)を検索する
+          -e, --english         英語名で検索する
+          -l, --lighter         基準のアーティファクトより軽いものに限る
+        """
+
+        try:
+            parse_result = self.like_parser.parse_args(args)
+        except Exception:
+            await ctx.send_help(ctx.command)
+            return
+
+        spoiler = await self.get_spoiler(
+            ctx, self.select_ref(parse_result.ref, parse_result.develop)
+        )
+        if spoiler is None:
+            return
+
+        result = ListSearch.resolve(
+            spoiler.search_index,
+            " ".join(parse_result.artifact_name),
+            parse_result.english,
+        )
+        await ListSearch.reply(
             ctx,
-            self.send_artifact_info,
+            result,
+            self.send_similar_artifacts,
             self.send_error,
-            spoiler,
-            spoiler.artifacts,
-            parse_result.artifact_name,
-            "fullname",
-            "fullname_en",
-            parse_result.english,
+            (spoiler, parse_result.lighter),
         )
 
-    async def send_artifact_info(
-        self, ctx: commands.Context, art: dict, spoiler: ArtifactSpoiler
+    async def send_similar_artifacts(
+        self,
+        ctx: commands.Context,
+        art: ArtifactRecord,
+        arg: Tuple[ArtifactSpoiler, bool],
     ):
-        art_desc = await spoiler.describe_artifact(art)
+        spoiler, lighter = arg
+        similar = spoiler.similar_artifacts(art, self.SIMILAR_LIMIT, lighter)
+        if not similar:
+            await self.send_error(ctx, "似たアーティファクトが見つかりませんでした")
+            return
+
+        lines = [
+            f"{score:.2f} [{a['id']}] ★{a['fullname']} ({a['weight'] / 20:.1f} kg)"
+            for a, score in similar
+        ]
+        title = f"★{art['fullname']} ({art['weight'] / 20:.1f} kg) に似たもの"
         embed = discord.Embed(
+            title=discord.utils.escape_markdown(limit_str_length(title, 256)),
+            description=discord.utils.escape_markdown("\n".join(lines)),
+        )
+        await ctx.reply(embed=embed)
+
+    @app_commands.command(name="art", description="アーティファクトを検索する")
+    @app_commands.describe(
+        artifact_name="検索するアーティファクトの名称の一部",
+        develop="開発(develop)ブランチを検索する",
+        ref="指定したブランチまたはタグ(例: 3.0.0)を検索する",
+        english="英語名で検索する",
+    )
+    async def art_slash(
+        self,
+        interaction: discord.Interaction,
+        artifact_name: str,
+        develop: bool = False,
+        ref: Optional[str] = None,
+        english: bool = False,
+    ):
+        ctx = await commands.Context.from_interaction(interaction)
+        await self.search_artifact(
+            ctx, self.select_ref(ref, develop), artifact_name, english
+        )
+
+    @art_slash.autocomplete("artifact_name")
+    async def art_slash_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        ref = self.select_ref(
+            interaction.namespace.ref, bool(interaction.namespace.develop)
+        )
+        # 補完のためにスポイラーを作成すると時間がかかるので、作成済みの場合のみ補完する
+        spoiler = self.refs.loaded(ref)
+        if spoiler is None:
+            return []
+        return ListSearch.autocomplete(
+            spoiler.search_index,
+            current,
+            bool(interaction.namespace.english),
+            self.autocomplete_stats,
+        )
+
+    def select_ref(self, ref: Optional[str], develop: bool) -> str:
+        if ref:
+            return ref
+        return "develop" if develop else "master"
+
+    async def get_spoiler(
+        self, ctx: commands.Context, ref: str
+    ) -> Optional[ArtifactSpoiler]:
+        try:
+            if self.refs.loaded(ref) is not None:
+                return await self.refs.get(ref)
+            # 初めて指定された ref はファイルの取得とDBの作成に時間がかかる
+            async with ctx.typing():
+                return await self.refs.get(ref)
+        except RefNotFoundError:
+            await self.send_error(ctx, f"{ref} のアーティファクト情報が取得できません")
+            return None
+
+    async def search_artifact(
+        self, ctx: commands.Context, ref: str, artifact_name: str, english: bool
+    ):
+        spoiler = await self.get_spoiler(ctx, ref)
+        if spoiler is None:
+            return
+
+        names = ListSearch.split_names(spoiler.search_index, artifact_name, english)
+        if len(names) > 1:
+            await self.search_artifacts(ctx, spoiler, names, english)
+            return
+
+        # 同じ検索が同時に要求された場合は1回の検索結果を共有する
+        result = await self.lookups.run(
+            ("art", normalize(artifact_name), english, ref, spoiler.dataset_version),
+            lambda: self.resolve_artifact(spoiler, artifact_name, english),
+        )
+        await ListSearch.reply(
+            ctx, result, self.send_artifact_info, self.send_error, spoiler
+        )
+
+    async def resolve_artifact(
+        self, spoiler: ArtifactSpoiler, artifact_name: str, english: bool
+    ) -> ListSearch.SearchResult:
+        result = ListSearch.resolve(spoiler.search_index, artifact_name, english)
+        if result.found is not None:
+            # 表示内容を組み立ててキャッシュしておき、結果を共有した要求でも使う
+            await spoiler.describe_artifact(result.found)
+        return result
+
+    async def search_artifacts(
+        self,
+        ctx: commands.Context,
+        spoiler: ArtifactSpoiler,
+        artifact_names: List[str],
+        english: bool,
+    ):
+        if len(artifact_names) > ListSearch.MAX_BATCH_SIZE:
+            await self.send_error(
+                ctx, f"一度に検索できるのは {ListSearch.MAX_BATCH_SIZE} 件までです"
+            )
+            return
+
+        results = [
+            (name, ListSearch.resolve(spoiler.search_index, name, english))
+            for name in artifact_names
+        ]
+        await ListSearch.reply_batch(
+            ctx,
+            results,
+            self.create_artifact_embeds,
+            self.send_artifact_info,
+            self.send_error,
+            spoiler,
+        )
+
+    async def create_artifact_embeds(
+        self, arts: List[ArtifactRecord], spoiler: ArtifactSpoiler
+    ) -> List[discord.Embed]:
+        return [
+            self.create_artifact_embed(art_desc)
+            for art_desc in await spoiler.describe_artifacts(arts)
+        ]
+
+    def create_artifact_embed(self, art_desc: tuple[str, str]) -> discord.Embed:
+        return discord.Embed(
             title=discord.utils.escape_markdown(art_desc[0]),
             description=discord.utils.escape_markdown(art_desc[1]),
         )
-        await ctx.reply(embed=embed)
+
+    async def send_artifact_info(
+        self, ctx: commands.Context, art: ArtifactRecord, spoiler: ArtifactSpoiler
+    ):
+        art_desc = await spoiler.describe_artifact(art)
+        await ctx.reply(embed=self.create_artifact_embed(art_desc))
 
     async def send_error(self, ctx: commands.Context, error_msg: str):
         embed = discord.Embed(title=error_msg, color=discord.Color.red())
@@ -327,12 +941,22 @@ class ArtifactSpoilerCog(commands.Cog):
 
     @tasks.loop(seconds=300)
     async def checker_task(self) -> None:
+        logger = getLogger(__name__)
+        logger.debug(f"Artifact lookup stats: {self.lookups.stats()}")
+        logger.debug(f"HTTP cache stats: {self.http_cache.stats()}")
         async with aiohttp.ClientSession() as session:
-            update_tasks = [
-                spoiler.check_for_updates(session) for spoiler in self.spoilers.values()
-            ]
-            await asyncio.gather(*update_tasks)
+            await self.refs.poll(session)
+        self.mark_data_ready()
+
+    @checker_task.before_loop
+    async def before_checker_task(self) -> None:
+        await self.bot.startup.wait_first_refresh(__name__)
+
+    def mark_data_ready(self) -> None:
+        # 既定のブランチを検索できるようになったら、起動時のデータの準備ができたとする
+        if self.refs.loaded(self.BRANCHES[0]) is not None:
+            self.bot.startup.mark_data_ready(__name__)
 
 
 async def setup(bot):
-    await bot.add_cog(ArtifactSpoilerCog(bot, bot.ext))
+    await bot.add_cog(ArtifactSpoilerCog(bot, bot.ext_configs[__name__]))
@@ -44,4 +44,4 @@ class ChannelLogger(commands.Cog):
 
 
 async def setup(bot):
-    await bot.add_cog(ChannelLogger(bot, bot.ext))
+    await bot.add_cog(ChannelLogger(bot, bot.ext_configs[__name__]))
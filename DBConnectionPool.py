@@ -0,0 +1,152 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from logging import getLogger
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Tuple
+
+import aiosqlite
+
+from utils import LatencyStats
+
+
+class DBConnectionPool:
+    """読み込み専用SQLiteコネクションのプール
+
+    aiosqlite のコネクションは1つごとにワーカースレッドを持つため、
+    検索のたびに接続/切断を行うとそのコストが支配的になる。
+    このクラスは読み込み専用のコネクションを使い回し、接続コストを削減する。
+    """
+
+    DEFAULT_MAX_SIZE = 4
+    DEFAULT_MMAP_SIZE = 64 * 1024 * 1024
+    CACHED_STATEMENTS = 64
+    SLOW_WAIT_SECONDS = 0.1
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = DEFAULT_MAX_SIZE,
+        mmap_size: int = DEFAULT_MMAP_SIZE,
+    ):
+        """コネクションプールのインスタンスを生成する
+
+        Args:
+            db_path (str): DBのパス
+            max_size (int, optional): 同時に使用できるコネクションの最大数
+            mmap_size (int, optional): コネクションに設定するPRAGMA mmap_sizeの値
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.mmap_size = mmap_size
+        self.wait_stats = LatencyStats()
+
+        self._semaphore = asyncio.Semaphore(max_size)
+        self._idle: List[Tuple[int, aiosqlite.Connection]] = []
+        self._generation = 0
+
+    async def _open(self) -> aiosqlite.Connection:
+        uri = f"{Path(self.db_path).absolute().as_uri()}?mode=ro"
+        conn = await aiosqlite.connect(
+            uri, uri=True, cached_statements=self.CACHED_STATEMENTS
+        )
+        conn.row_factory = aiosqlite.Row
+        await conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return conn
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        """プールからコネクションを借り出す
+
+        コネクションの row_factory には aiosqlite.Row が設定されている。
+        ブロックを抜けるとコネクションはプールに返却される。
+
+        Yields:
+            aiosqlite.Connection: 読み込み専用のコネクション
+        """
+        start = time.perf_counter()
+        async with self._semaphore:
+            wait = time.perf_counter() - start
+            self.wait_stats.record(wait)
+            if wait >= self.SLOW_WAIT_SECONDS:
+                getLogger(__name__).warning(
+                    f"DB connection pool wait {wait * 1000:.1f}ms: {self.db_path}"
+                )
+
+            if self._idle:
+                generation, conn = self._idle.pop()
+            else:
+                generation, conn = self._generation, await self._open()
+
+            try:
+                yield conn
+            except BaseException:
+                # 状態が不明なコネクションは再利用しない
+                await conn.close()
+                raise
+
+            if generation == self._generation:
+                self._idle.append((generation, conn))
+            else:
+                await conn.close()
+
+    async def reset(self) -> None:
+        """プールしているコネクションを破棄する
+
+        DBファイルが置き換えられた時などに呼び出す。
+        使用中のコネクションは返却時に破棄され、以降は新しいコネクションが使用される。
+        """
+        self._generation += 1
+        idle, self._idle = self._idle, []
+        for _, conn in idle:
+            await conn.close()
+
+    def stats(self) -> dict:
+        """プールの統計情報を返す
+
+        Returns:
+            dict: コネクション待ち時間の統計と、待機中のコネクション数
+        """
+        return {"wait": self.wait_stats.as_dict(), "idle": len(self._idle)}
+
+
+_pools: Dict[str, DBConnectionPool] = {}
+
+
+def get_pool(db_path: str) -> DBConnectionPool:
+    """DBのパスに対応するコネクションプールを返す
+
+    同じDBに対するプールはbot全体で共有される。
+
+    Args:
+        db_path (str): DBのパス
+
+    Returns:
+        DBConnectionPool: コネクションプール
+    """
+    key = str(Path(db_path).absolute())
+    if key not in _pools:
+        _pools[key] = DBConnectionPool(db_path)
+    return _pools[key]
+
+
+async def release_pool(db_path: str) -> None:
+    """DBのパスに対応するコネクションプールを破棄する
+
+    DBファイルを削除する前に呼び出す。
+
+    Args:
+        db_path (str): DBのパス
+    """
+    key = str(Path(db_path).absolute())
+    if (pool := _pools.pop(key, None)) is not None:
+        await pool.reset()
+
+
+async def release_all_pools() -> None:
+    """全てのコネクションプールを破棄する
+
+    プロセスを終了する前に呼び出す。
+    """
+    for db_path in list(_pools):
+        await release_pool(db_path)
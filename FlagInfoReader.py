@@ -1,5 +1,6 @@
 import sqlite3
 from collections.abc import Iterable
+from typing import Dict, Optional
 
 
 class FlagInfoReader:
@@ -24,29 +25,72 @@ class FlagInfoReader:
                         {"name": cols[0], "description": cols[1]}
                     )
 
-    def create_flag_info_table(self, db_path: str, flag_info_path: str) -> None:
-        with sqlite3.connect(db_path) as conn:
-            conn.execute("DROP TABLE IF EXISTS flag_info")
-            conn.execute(
-                """
+    def get_flags(self, flag_info_path: str) -> Iterable[dict]:
+        """フラグの一覧を返す
+
+        各フラグには flag_info.txt での出現順に通し番号(bit)を振る。
+        この番号はフラグのビットマスクでのビット位置として使用する。
+        """
+        bit = 0
+        for flag_group in self.get_flag_groups(flag_info_path):
+            for i, flag in enumerate(flag_group["flags"]):
+                yield {
+                    "name": flag["name"],
+                    "flag_group": flag_group["name"],
+                    "group_description": flag_group["description"],
+                    "id_in_group": i + 1,
+                    "description": flag["description"],
+                    "bit": bit,
+                }
+                bit += 1
+
+    def create_flag_info_table(
+        self, conn: sqlite3.Connection, flag_info_path: str
+    ) -> None:
+        conn.execute("DROP TABLE IF EXISTS flag_info")
+        conn.execute(
+            """
 CREATE TABLE flag_info(
     name TEXT PRIMARY KEY,
     flag_group TEXT,
     id_in_group INTEGER,
-    description TEXT
+    description TEXT,
+    bit INTEGER
 )
 """
-            )
-            for flag_group in self.get_flag_groups(flag_info_path):
-                for i, flag in enumerate(flag_group["flags"]):
-                    conn.execute(
-                        """
-INSERT INTO flag_info VALUES(:name, :flag_group, :id_in_group, :description)
+        )
+        conn.executemany(
+            """
+INSERT INTO flag_info VALUES(:name, :flag_group, :id_in_group, :description, :bit)
 """,
-                        {
-                            "name": flag["name"],
-                            "flag_group": flag_group["name"],
-                            "id_in_group": i + 1,
-                            "description": flag["description"],
-                        },
-                    )
+            self.get_flags(flag_info_path),
+        )
+
+
+def flags_to_mask(flags: Iterable[str], bits: Dict[str, int]) -> int:
+    """フラグ名の並びをビットマスクに変換する
+
+    bitsに含まれないフラグは無視する。
+
+    Args:
+        flags (Iterable[str]): フラグ名の並び
+        bits (Dict[str, int]): フラグ名とビット位置の対応
+
+    Returns:
+        int: ビットマスク
+    """
+    mask = 0
+    for flag in flags:
+        if flag in bits:
+            mask |= 1 << bits[flag]
+    return mask
+
+
+def mask_to_bytes(mask: int) -> bytes:
+    """ビットマスクをDBに格納するバイト列(リトルエンディアン)に変換する"""
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+
+def mask_from_bytes(data: Optional[bytes]) -> int:
+    """DBに格納したバイト列をビットマスクに変換する"""
+    return int.from_bytes(data or b"", "little")
@@ -0,0 +1,250 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional, TypeVar
+
+import aiohttp
+
+DEFAULT_CACHE_PATH = "~/.http_cache.db"
+
+T = TypeVar("T")
+
+
+@dataclass
+class FetchResult:
+    """条件付きGETの結果"""
+
+    status: int
+    # 200の場合は取得した本文、304の場合は保存していた本文(保存していなければNone)
+    text: Optional[str] = None
+    # 200の場合のレスポンスヘッダ。検証子の保存を呼び出し側で行う場合に使う
+    headers: Optional[Mapping[str, str]] = None
+
+    @property
+    def modified(self) -> bool:
+        return self.status == 200
+
+
+class HttpCache:
+    """URL毎の検証子(ETag, Last-Modified)をディスクに保存する
+
+    保存した検証子を次回のリクエストに付けることで、再起動後も
+    変更の無いファイルは 304 Not Modified となり、再取得せずに済む。
+    レスポンスの本文も保存しておくと、304の場合に保存した本文を返す。
+    保存する本文の合計サイズには上限があり、超えた場合は最後に取得・参照された
+    時刻が古いものから破棄する。
+    DBの読み書きはイベントループを止めないよう、別スレッドで行う。
+    """
+
+    DEFAULT_MAX_BODY_BYTES = 16 * 1024 * 1024
+    BUSY_TIMEOUT_MS = 5000
+
+    def __init__(self, db_path: str, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES):
+        """インスタンスを生成する
+
+        Args:
+            db_path (str): 検証子を保存するDBのパス
+            max_body_bytes (int, optional): 保存する本文の合計サイズの上限(バイト)
+        """
+        self.db_path = db_path
+        self.max_body_bytes = max_body_bytes
+        self.hits = 0
+        self.misses = 0
+
+        # 1件ずつの小さな読み書きなので、コネクションを開いたまま自動コミットで使う
+        # 読み書きは asyncio.to_thread のスレッドで行うので、ロックで1つずつにする
+        self._conn = sqlite3.connect(
+            db_path, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        # botと updater.py が同じDBを使うので、書き込みが重なったらロックの解放を待つ
+        self._conn.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+CREATE TABLE IF NOT EXISTS http_cache(
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body TEXT,
+    fetched_at REAL
+)
+"""
+        )
+        columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(http_cache)")
+        ]
+        if "fetched_at" not in columns:
+            self._conn.execute("ALTER TABLE http_cache ADD COLUMN fetched_at REAL")
+
+    async def validators(self, url: str, require_body: bool = False) -> Dict[str, str]:
+        """URLに対して保存している検証子をリクエストヘッダの形で返す
+
+        Args:
+            url (str): URL
+            require_body (bool, optional): 本文を保存している場合のみ返す.
+                Defaults to False.
+
+        Returns:
+            Dict[str, str]: if-none-match, if-modified-since ヘッダ。
+                保存していなければ空の辞書
+        """
+        row = await self._run(
+            lambda: self._conn.execute(
+                "SELECT etag, last_modified, body IS NOT NULL FROM http_cache"
+                " WHERE url = ?",
+                (url,),
+            ).fetchone()
+        )
+        if row is None or (require_body and not row[2]):
+            return {}
+
+        headers = {}
+        if row[0]:
+            headers["if-none-match"] = row[0]
+        if row[1]:
+            headers["if-modified-since"] = row[1]
+        return headers
+
+    async def store(
+        self, url: str, headers: Mapping[str, str], body: Optional[str] = None
+    ) -> None:
+        """レスポンスの検証子を保存する
+
+        Args:
+            url (str): URL
+            headers (Mapping[str, str]): ステータスが200のレスポンスのヘッダ
+            body (Optional[str], optional): 保存する本文. Defaults to None.
+        """
+        self.misses += 1
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not etag and not last_modified:
+            await self.forget(url)
+            return
+
+        def store():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache"
+                "(url, etag, last_modified, body, fetched_at) VALUES(?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, time.time()),
+            )
+            if body is not None:
+                self._evict_bodies()
+
+        await self._run(store)
+
+    def _evict_bodies(self) -> None:
+        """本文の合計サイズが上限を超えた分を、参照された時刻が古いものから破棄する
+
+        本文を破棄したURLは本文付きの再取得が必要になるので、検証子ごと削除する。
+        """
+        self._conn.execute(
+            """
+DELETE FROM http_cache WHERE url IN (
+    SELECT url FROM (
+        SELECT url, SUM(LENGTH(CAST(body AS BLOB)))
+            OVER (ORDER BY fetched_at DESC, url) AS total
+        FROM http_cache WHERE body IS NOT NULL
+    ) WHERE total > ?
+)
+""",
+            (self.max_body_bytes,),
+        )
+
+    async def not_modified(self, url: str) -> Optional[str]:
+        """304 Not Modified を受け取ったことを記録し、保存していた本文を返す
+
+        Args:
+            url (str): URL
+
+        Returns:
+            Optional[str]: 保存していた本文。保存していなければNone
+        """
+        self.hits += 1
+
+        def not_modified():
+            self._conn.execute(
+                "UPDATE http_cache SET fetched_at = ? WHERE url = ?",
+                (time.time(), url),
+            )
+            return self._conn.execute(
+                "SELECT body FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+
+        row = await self._run(not_modified)
+        return row[0] if row is not None else None
+
+    async def forget(self, url: str) -> None:
+        """URLの検証子を破棄し、次回は全体を取得させる"""
+        await self._run(
+            lambda: self._conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+        )
+
+    async def _run(self, func: Callable[[], T]) -> T:
+        def locked() -> T:
+            with self._lock:
+                return func()
+
+        return await asyncio.to_thread(locked)
+
+    async def fetch(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        keep_body: bool = False,
+        revalidate: bool = True,
+        defer_store: bool = False,
+    ) -> FetchResult:
+        """検証子を付けてURLを取得する
+
+        Args:
+            session (aiohttp.ClientSession): リクエストに使用するセッション
+            url (str): URL
+            keep_body (bool, optional): 本文を保存し、304の場合に返す. Defaults to False.
+            revalidate (bool, optional): Falseの場合は検証子を付けずに全体を取得する.
+                取得したデータの保存先が失われている場合などに指定する. Defaults to True.
+            defer_store (bool, optional): Trueの場合は検証子を保存しない.
+                取得した内容の処理を終えてから、呼び出し側で結果の headers を
+                store() に渡す. Defaults to False.
+
+        Returns:
+            FetchResult: 取得結果
+        """
+        headers = await self.validators(url, keep_body) if revalidate else {}
+        async with session.get(url, headers=headers) as res:
+            if res.status == 304:
+                return FetchResult(304, await self.not_modified(url))
+            if res.status != 200:
+                return FetchResult(res.status)
+            text = await res.text()
+            if not defer_store:
+                await self.store(url, res.headers, text if keep_body else None)
+            return FetchResult(200, text, res.headers)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_caches: Dict[str, HttpCache] = {}
+
+
+def get_cache(db_path: str = DEFAULT_CACHE_PATH) -> HttpCache:
+    """DBのパスに対応するキャッシュを返す
+
+    同じDBに対するキャッシュはbot全体で共有される。
+
+    Args:
+        db_path (str, optional): 検証子を保存するDBのパス
+
+    Returns:
+        HttpCache: キャッシュ
+    """
+    key = str(Path(os.path.expanduser(db_path)).absolute())
+    if key not in _caches:
+        _caches[key] = HttpCache(key)
+    return _caches[key]
@@ -0,0 +1,83 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class IngestWorkerPool:
+    """スポイラーの取り込み処理を別プロセスで実行するワーカープール
+
+    ファイルのパースやDBの作成はCPUを使い続けるため、スレッドで実行しても
+    GILを取り合ってイベントループ(ハートビートやコマンドへの応答)を遅らせる。
+    このクラスはそれらの処理をワーカープロセスで実行する。
+    ワーカーには引数と戻り値がpickleで渡されるため、処理はモジュールの
+    トップレベルの関数とし、結果は必要な分だけに絞って返すこと。
+    """
+
+    DEFAULT_MAX_WORKERS = 2
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        """インスタンスを生成する
+
+        ワーカープロセスは最初に処理を依頼された時に起動する。
+
+        Args:
+            max_workers (int, optional): ワーカープロセスの最大数
+        """
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # botのプロセスはスレッドを持っているので、fork ではなく spawn で起動する
+            self._executor = ProcessPoolExecutor(
+                self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """ワーカープロセスで func(*args) を実行し、結果を返す
+
+        Args:
+            func (Callable[..., T]): 実行する関数。pickle可能なトップレベルの関数
+
+        Returns:
+            T: 関数の戻り値
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            # ワーカーが異常終了した場合、プールは使えなくなるので次回作り直す
+            self._executor = None
+            raise
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool: Optional[IngestWorkerPool] = None
+
+
+def get_pool(
+    max_workers: int = IngestWorkerPool.DEFAULT_MAX_WORKERS,
+) -> IngestWorkerPool:
+    """ワーカープールを返す
+
+    ワーカープールはbot全体で共有される。最大数は最初に呼び出した時の値となる。
+
+    Args:
+        max_workers (int, optional): ワーカープロセスの最大数
+
+    Returns:
+        IngestWorkerPool: ワーカープール
+    """
+    global _pool
+    if _pool is None:
+        _pool = IngestWorkerPool(max_workers)
+    return _pool
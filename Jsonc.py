@@ -1,12 +1,52 @@
+import json
+import re
 from typing import Any
 
 import json5
 
+# ブロックコメント。.*? を使うと、後続にマッチしなかった時に次の */ を探して
+# 文書の末尾まで走査し直すため、最初の */ で必ず終わるように展開して書く
+_BLOCK_COMMENT = r"/\*[^*]*\*+(?:[^/*][^*]*\*+)*/"
+
+# 文字列、コメント、閉じ括弧の直前のカンマ(間の空白とコメントを含む)のいずれかにマッチする
+# 文字列を先に試すことで、文字列中の // や , を誤って削除しないようにする
+_JSONC_TOKEN = re.compile(
+    rf"""
+    (?P<string>"[^"\\]*(?:\\.[^"\\]*)*")
+    | (?P<comment>//[^\n]*|{_BLOCK_COMMENT})
+    | ,(?=(?:\s|//[^\n]*|{_BLOCK_COMMENT})*[\]}}])
+    """,
+    re.VERBOSE,
+)
+
+
+def _replace_token(m: re.Match) -> str:
+    if m.lastgroup == "string":
+        return m[0]
+    if m.lastgroup == "comment":
+        return " "
+    # 末尾のカンマ
+    return ""
+
+
+def strip_jsonc(jsonc_data: str) -> str:
+    """jsonc形式の文字列からコメントと末尾のカンマを削除する
+
+    Args:
+        jsonc_data (str): jsonc形式の文字列
+
+    Returns:
+        str: json形式の文字列
+    """
+    return _JSONC_TOKEN.sub(_replace_token, jsonc_data)
+
 
 def parse_jsonc(jsonc_data: str) -> Any:
     """jsonc形式の文字列をパースする
 
-    jsonc形式の文字列を受け取り、コメントを削除してjsonとしてパースする
+    jsonc形式の文字列を受け取り、コメントと末尾のカンマを削除してjsonとしてパースする。
+    jsonとしてパースできない場合(json5の記法が使われている場合など)は
+    json5としてパースする。
 
     Args:
         jsonc_data (str): jsonc形式の文字列
@@ -14,5 +54,7 @@ def parse_jsonc(jsonc_data: str) -> Any:
     Returns:
         Any: パースした結果のオブジェクト
     """
-    json_obj = json5.loads(jsonc_data)
-    return json_obj
+    try:
+        return json.loads(strip_jsonc(jsonc_data))
+    except ValueError:
+        return json5.loads(jsonc_data)
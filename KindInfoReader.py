@@ -32,11 +32,10 @@ class KindInfoReader:
 
             yield asdict(k_info)
 
-    def create_k_info_table(self, db_path: str, k_info_txt: str) -> None:
-        with sqlite3.connect(db_path) as conn:
-            conn.execute("DROP TABLE IF EXISTS k_info")
-            conn.execute(
-                """
+    def create_k_info_table(self, conn: sqlite3.Connection, k_info_txt: str) -> None:
+        conn.execute("DROP TABLE IF EXISTS k_info")
+        conn.execute(
+            """
 CREATE TABLE k_info(
     id INTEGER PRIMARY KEY,
     name TEXT,
@@ -46,15 +45,15 @@ CREATE TABLE k_info(
     pval INTEGER
 )
 """
-            )
-            conn.execute(
-                """
+        )
+        conn.execute(
+            """
 CREATE INDEX k_info_index_tval_sval ON k_info(tval, sval)
 """
-            )
-            conn.executemany(
-                """
+        )
+        conn.executemany(
+            """
 INSERT INTO k_info values(:id, :name, :english_name, :tval, :sval, :pval)
 """,
-                self.get_k_info_list(k_info_txt),
-            )
+            self.get_k_info_list(k_info_txt),
+        )
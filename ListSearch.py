@@ -1,13 +1,32 @@
-from typing import Any, Callable, Coroutine, List, TypeVar
+import re
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Any, Callable, Coroutine, List, Optional, Tuple, TypeVar
 
 import discord
+from discord import app_commands
 from discord.ext import commands
-from fuzzywuzzy import fuzz
 
-from utils import limit_str_length
+from SearchIndex import SearchIndex
+from utils import LatencyStats, limit_str_length
 
 T = TypeVar("T")
 
+# 複数の名前をまとめて検索する時の区切り文字
+NAME_SEPARATOR = re.compile(r"[,、，]")
+# まとめて検索できる名前の最大数
+MAX_BATCH_SIZE = 10
+
+# 1つのメッセージに含められるEmbedの最大数と合計文字数(Discordの上限)
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+# 入力補完で返す候補の最大数(Discordの上限)
+AUTOCOMPLETE_LIMIT = 25
+# 入力補完の応答時間がこれを超えたら警告を出す(秒)
+AUTOCOMPLETE_WARN_SECONDS = 0.1
+
 
 class SelectView(discord.ui.View):
 
@@ -45,69 +64,249 @@ class SelectButton(discord.ui.Button):
         await view.on_selected(view.ctx, self.item, view.callback_arg)
 
 
-async def search(
-    ctx: commands.Context,
-    on_found: Callable[[commands.Context, dict, T], Coroutine[Any, Any, None]],
-    on_error: Callable[[commands.Context, str], Coroutine[Any, Any, None]],
-    callback_arg: T,
-    items: List[dict],
-    search_str: str,
-    name_key: str,
-    ename_key: str,
-    english: bool = False,
-) -> None:
-    """リストから検索を行う
+@dataclass
+class SearchResult:
+    """検索結果
+
+    found, candidates, error のいずれか1つが設定される。
+    """
 
-    リストから、search_strで与えた文字列が、itemsで与えたリストの要素である
+    # 候補の表示に使用する辞書のキー
+    name_key: str
+    # 1件に特定できた要素
+    found: Optional[dict] = None
+    # 選択させる候補
+    candidates: List[dict] = field(default_factory=list)
+    # candidatesがあいまい検索による候補かどうか
+    fuzzy: bool = False
+    # エラーメッセージ
+    error: Optional[str] = None
+
+
+def resolve(index: SearchIndex, search_str: str, english: bool = False) -> SearchResult:
+    """リストから検索を行い、結果を返す
+
+    リストから、search_strで与えた文字列が、indexで与えたリストの要素である
     辞書の指定したキーの値に一致するものを検索する。
-    部分一致で検索し、複数の候補があった場合は候補を表示して選択させる。
-    部分一致で一致するものがなかった場合は曖昧検索により候補を表示して選択させる。
+    部分一致で検索し、1件に特定できなかった場合は候補を返す。
+    部分一致で一致するものがなかった場合は曖昧検索による候補を返す。
+    比較はかな・カナや全角・半角、大文字小文字の違いを無視して行う。
 
     部分一致検索は、まず辞書のキーをname_keyで検索し、一致しなければename_keyにより検索する。
     ただし、englishがTrueの場合はename_keyのみ検索する。
 
     Args:
-        ctx (commands.Context): コマンド実行コンテキスト
-        on_found: 検索完了時に呼ばれるコールバック
-        on_error: 検索エラーが発生した時に呼ばれるコールバック
-        items (List[dict]): 検索を行うリスト
+        index (SearchIndex): 検索を行うリストのインデックス
         search_str (str): 検索する文字列
-        name_key (str): 検索の時に参照する辞書のキー
-        ename_key (str): 英語名検索の時に参照する辞書のキー
         english (bool, optional): 英語名検索をする. Defaults to False.
+
+    Returns:
+        SearchResult: 検索結果
     """
     candidates = []
 
     if not english:
-        candidates = [i for i in items if search_str in i[name_key]]
+        candidates = index.find(search_str)
     if not candidates:
-        search_str = search_str.lower()
-        candidates = [i for i in items if search_str in str.lower(i[ename_key])]
+        candidates = index.find(search_str, english=True)
 
-    name = ename_key if english else name_key
+    name = index.ename_key if english else index.name_key
 
     # 完全一致チェック
-    exact_matches = [i for i in candidates if i.get(name, "") == search_str]
+    candidate_ids = {id(i) for i in candidates}
+    exact_matches = [
+        i for i in index.find_exact(name, search_str) if id(i) in candidate_ids
+    ]
     if len(exact_matches) == 1:
-        await on_found(ctx, exact_matches[0], callback_arg)
-        return
+        return SearchResult(name, found=exact_matches[0])
 
     if not candidates:
-        suggests = sorted(
-            items,
-            key=lambda x: fuzz.partial_ratio(search_str, str.lower(x[name])),
-            reverse=True,
-        )[:10]
-        view = SelectView(ctx, on_found, callback_arg)
-        for i in suggests:
-            view.add_item(SelectButton(i, i[name]))
-        await ctx.reply("もしかして:", view=view, delete_after=15)
+        return SearchResult(
+            name, candidates=index.suggest(search_str, english), fuzzy=True
+        )
     elif len(candidates) == 1:
-        await on_found(ctx, candidates[0], callback_arg)
+        return SearchResult(name, found=candidates[0])
     elif len(candidates) <= 10:
-        view = SelectView(ctx, on_found, callback_arg)
-        for i in candidates:
-            view.add_item(SelectButton(i, i[name]))
-        await ctx.reply("候補:", view=view, delete_after=15)
+        return SearchResult(name, candidates=candidates)
     else:
-        await on_error(ctx, f"候補が多すぎます ({len(candidates)} 件)")
+        return SearchResult(name, error=f"候補が多すぎます ({len(candidates)} 件)")
+
+
+async def reply(
+    ctx: commands.Context,
+    result: SearchResult,
+    on_found: Callable[[commands.Context, dict, T], Coroutine[Any, Any, None]],
+    on_error: Callable[[commands.Context, str], Coroutine[Any, Any, None]],
+    callback_arg: T,
+    heading: str = "",
+) -> None:
+    """検索結果に応じた返信を行う
+
+    1件に特定できた場合はon_foundを呼び出し、候補がある場合は候補を表示して選択させる。
+
+    Args:
+        ctx (commands.Context): コマンド実行コンテキスト
+        result (SearchResult): 検索結果
+        on_found: 検索完了時に呼ばれるコールバック
+        on_error: 検索エラーが発生した時に呼ばれるコールバック
+        heading (str, optional): 候補やエラーの表示の先頭に付ける文字列. Defaults to "".
+    """
+    prefix = f"{heading}: " if heading else ""
+    if result.found is not None:
+        await on_found(ctx, result.found, callback_arg)
+    elif result.error is not None:
+        await on_error(ctx, prefix + result.error)
+    else:
+        view = SelectView(ctx, on_found, callback_arg)
+        for i in result.candidates:
+            view.add_item(SelectButton(i, i[result.name_key]))
+        message = "もしかして:" if result.fuzzy else "候補:"
+        await ctx.reply(prefix + message, view=view, delete_after=15)
+
+
+def split_names(
+    index: SearchIndex, search_str: str, english: bool = False
+) -> List[str]:
+    """まとめて検索する名前を区切り文字で分割する
+
+    区切り文字を含む名前もあるため、search_str全体で部分一致する要素がある場合は
+    分割しない。
+
+    Args:
+        index (SearchIndex): 検索を行うリストのインデックス
+        search_str (str): 検索する文字列
+        english (bool, optional): 英語名検索をする. Defaults to False.
+
+    Returns:
+        List[str]: 分割した名前のリスト
+    """
+    if not NAME_SEPARATOR.search(search_str):
+        return [search_str]
+    if (not english and index.find(search_str)) or index.find(search_str, True):
+        return [search_str]
+
+    names = [name.strip() for name in NAME_SEPARATOR.split(search_str)]
+    return [name for name in names if name] or [search_str]
+
+
+def paginate_embeds(embeds: List[discord.Embed]) -> List[List[discord.Embed]]:
+    """Embedのリストを1つのメッセージで送信できる単位に分割する
+
+    Args:
+        embeds (List[discord.Embed]): 分割するEmbedのリスト
+
+    Returns:
+        List[List[discord.Embed]]: メッセージ毎のEmbedのリスト
+    """
+    pages: List[List[discord.Embed]] = []
+    chars = 0
+    for embed in embeds:
+        if (
+            not pages
+            or len(pages[-1]) >= MAX_EMBEDS_PER_MESSAGE
+            or chars + len(embed) > MAX_EMBED_CHARS_PER_MESSAGE
+        ):
+            pages.append([])
+            chars = 0
+        pages[-1].append(embed)
+        chars += len(embed)
+    return pages
+
+
+async def reply_batch(
+    ctx: commands.Context,
+    results: List[Tuple[str, SearchResult]],
+    create_embeds: Callable[[List[dict], T], Coroutine[Any, Any, List[discord.Embed]]],
+    on_found: Callable[[commands.Context, dict, T], Coroutine[Any, Any, None]],
+    on_error: Callable[[commands.Context, str], Coroutine[Any, Any, None]],
+    callback_arg: T,
+) -> None:
+    """複数の名前の検索結果に応じた返信を行う
+
+    1件に特定できたものはcreate_embedsでまとめてEmbedを作成し、1つの返信で表示する。
+    Discordの制限を超える場合は複数の返信に分ける。
+    1件に特定できなかったものは、名前毎に候補を表示して選択させる。
+
+    Args:
+        ctx (commands.Context): コマンド実行コンテキスト
+        results (List[Tuple[str, SearchResult]]): 検索した名前と検索結果のリスト
+        create_embeds: 特定できた要素のリストからEmbedのリストを作成するコールバック
+        on_found: 候補が選択された時に呼ばれるコールバック
+        on_error: 検索エラーが発生した時に呼ばれるコールバック
+    """
+    found = {
+        id(result.found): result.found
+        for _, result in results
+        if result.found is not None
+    }
+    if found:
+        embeds = await create_embeds(list(found.values()), callback_arg)
+        for page in paginate_embeds(embeds):
+            await ctx.reply(embeds=page)
+
+    for name, result in results:
+        if result.found is None:
+            await reply(ctx, result, on_found, on_error, callback_arg, name)
+
+
+async def search(
+    ctx: commands.Context,
+    on_found: Callable[[commands.Context, dict, T], Coroutine[Any, Any, None]],
+    on_error: Callable[[commands.Context, str], Coroutine[Any, Any, None]],
+    callback_arg: T,
+    index: SearchIndex,
+    search_str: str,
+    english: bool = False,
+) -> None:
+    """リストから検索を行い、結果に応じた返信を行う
+
+    検索の詳細は resolve を、返信の詳細は reply を参照。
+
+    Args:
+        ctx (commands.Context): コマンド実行コンテキスト
+        on_found: 検索完了時に呼ばれるコールバック
+        on_error: 検索エラーが発生した時に呼ばれるコールバック
+        index (SearchIndex): 検索を行うリストのインデックス
+        search_str (str): 検索する文字列
+        english (bool, optional): 英語名検索をする. Defaults to False.
+    """
+    result = resolve(index, search_str, english)
+    await reply(ctx, result, on_found, on_error, callback_arg)
+
+
+def autocomplete(
+    index: SearchIndex, current: str, english: bool, stats: LatencyStats
+) -> List[app_commands.Choice[str]]:
+    """スラッシュコマンドの入力補完の候補を返す
+
+    名前か英語名が入力途中の文字列で始まる要素を候補とする。
+    候補の値は englishがTrueの場合は英語名、そうでなければ名前となる。
+    処理時間をstatsに記録し、時間がかかった場合は警告を出す。
+
+    Args:
+        index (SearchIndex): 候補を検索するリストのインデックス
+        current (str): 入力途中の文字列
+        english (bool): 英語名で検索する
+        stats (LatencyStats): 処理時間を記録する統計
+
+    Returns:
+        List[app_commands.Choice[str]]: 入力補完の候補
+    """
+    start = time.perf_counter()
+    value_key = index.ename_key if english else index.name_key
+    choices = [
+        app_commands.Choice(
+            name=limit_str_length(f"{i[index.name_key]} / {i[index.ename_key]}", 100),
+            value=limit_str_length(i[value_key], 100),
+        )
+        for i in index.complete(current, AUTOCOMPLETE_LIMIT)
+    ]
+
+    elapsed = time.perf_counter() - start
+    stats.record(elapsed)
+    if elapsed >= AUTOCOMPLETE_WARN_SECONDS:
+        getLogger(__name__).warning(
+            f"Autocomplete took {elapsed * 1000:.1f}ms for {current!r}"
+            f" (count={stats.count}, max={stats.max * 1000:.1f}ms)"
+        )
+    return choices
@@ -0,0 +1,159 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class MonsterAbilities:
+    """モンスター詳細から抽出した能力"""
+
+    # 打撃: {"blow_index", "method", "dice", "damage_avg"}
+    blows: List[dict] = field(default_factory=list)
+    # ブレス・呪文: {"kind": "breath"|"spell", "name"}
+    spells: List[dict] = field(default_factory=list)
+    # 耐性・免疫・弱点: {"kind": "resist"|"immune"|"vulnerable", "element"}
+    resists: List[dict] = field(default_factory=list)
+    # ドロップ: {"flag"}
+    drops: List[dict] = field(default_factory=list)
+    # 分類できなかった文の数
+    unclassified: int = 0
+
+
+class MonsterAbilityParser:
+    """モンスター詳細の文章から能力を抽出する
+
+    モンスター詳細は思い出し(lore)の文章をそのまま出力したものなので、
+    文ごとに定型の言い回しを探して能力を取り出す。
+    どの言い回しにも当てはまらなかった文は unclassified として数え、
+    スポイラーの書式が変わった時に気付けるようにする。
+    """
+
+    # 思い出しの文章の始まり。これより前の文はモンスターの説明文として扱う
+    # 見つからない場合は書式が変わったとみなし、全ての文を unclassified とする
+    LORE_START = re.compile(r"出現|生息|地上に住")
+
+    # 列挙された項目の区切り
+    # 「や」「と」は「とおせんぼ」のような名前の一部を区切らないよう、
+    # ひらがな以外の文字に挟まれている場合のみ区切りとする
+    ITEM_SEPARATOR = re.compile(
+        r"[、，]|(?<=[^\u3041-\u309f、，])(?:や|と|および|及び)(?=[^\u3041-\u309f、，])"
+    )
+
+    # 前の節の終わり。列挙はこれより後にある
+    CLAUSE_BREAK = re.compile(
+        r"(?:吐き|唱え|使い|持ち|あり|おり|ないし|でき)、|また、|、そして"
+    )
+
+    # 列挙の始まり(主語と発動の確率)
+    LIST_START = re.compile(r"(?:.*?は)?(?:\d+/\d+の確率で、?)?")
+
+    SPELL_PATTERNS = [
+        ("breath", re.compile(r"の?ブレスを吐")),
+        ("spell", re.compile(r"の?(?:呪文|魔法)を(?:唱え|使)")),
+    ]
+    RESIST_PATTERNS = [
+        ("resist", re.compile(r"(?:への|に対する|の)?耐性を持")),
+        (
+            "immune",
+            re.compile(r"(?:を受け付けない|させられない|されない|が効かない|の免疫)"),
+        ),
+        ("vulnerable", re.compile(r"(?:に弱い|が弱点|の弱点|でダメージを受け)")),
+    ]
+    BLOW_PATTERN = re.compile(r"([^、。()]*?)\((\d+)[dD](\d+)\)")
+    DROP_PATTERN = re.compile(r"落とす")
+    DROP_FLAGS = [
+        ("DROP_GREAT", re.compile(r"高級|素晴らしい|特別")),
+        ("DROP_GOOD", re.compile(r"上質|良い")),
+        ("DROP_GOLD", re.compile(r"財宝|お金|金貨")),
+        ("DROP_ITEM", re.compile(r"アイテム|物")),
+    ]
+
+    # 能力以外の情報を表す思い出しの定型句。分類済みとして扱う
+    # 書式の変化を見逃さないよう、一語ではなく言い回し全体で指定する
+    IGNORED_PATTERNS = re.compile(
+        r"で出現し|地上に住み|(?:速度|素早く|ゆっくりと)動いている|"
+        r"ポイントの経験となる|(?:護衛を伴って|集団で|群れで)現れる|"
+        r"に包まれている|侵入者を(?:無視|見過ご|注意深く|警戒)|"
+        r"フィート先から侵入者に気付く|透明で目に見えない|"
+        r"壁をすり抜ける|壁を掘り進む|扉を(?:開け|打ち破)|"
+        r"体力を(?:素早く)?回復する|テレパシーでは感知できない|"
+        r"このモンスターを倒したことはない|体倒している|"
+        r"(?:について|の能力は)(?:何も)?知られていない"
+    )
+
+    def parse(self, detail: str) -> MonsterAbilities:
+        """モンスター詳細から能力を抽出する
+
+        Args:
+            detail (str): モンスター詳細
+
+        Returns:
+            MonsterAbilities: 抽出した能力
+        """
+        abilities = MonsterAbilities()
+        sentences = [s.strip() for s in re.split(r"(?<=。)", detail) if s.strip()]
+
+        lore_start = next(
+            (i for i, s in enumerate(sentences) if self.LORE_START.search(s)), None
+        )
+        if lore_start is None:
+            abilities.unclassified = len(sentences)
+            return abilities
+
+        for sentence in sentences[lore_start:]:
+            if not self.parse_sentence(sentence, abilities):
+                abilities.unclassified += 1
+
+        return abilities
+
+    def parse_sentence(self, sentence: str, abilities: MonsterAbilities) -> bool:
+        # 確率等の補足情報は除いておく
+        sentence = re.sub(r"\((?:確率|\d+%)[^)]*\)", "", sentence)
+        classified = False
+
+        for kind, pattern in self.SPELL_PATTERNS:
+            for name in self.find_items(sentence, pattern):
+                abilities.spells.append({"kind": kind, "name": name})
+                classified = True
+
+        for kind, pattern in self.RESIST_PATTERNS:
+            for element in self.find_items(sentence, pattern):
+                abilities.resists.append({"kind": kind, "element": element})
+                classified = True
+
+        for m in self.BLOW_PATTERN.finditer(sentence):
+            dice_num, dice_side = int(m[2]), int(m[3])
+            abilities.blows.append(
+                {
+                    "blow_index": len(abilities.blows) + 1,
+                    "method": self.strip_list_start(m[1]),
+                    "dice": f"{dice_num}d{dice_side}",
+                    "damage_avg": dice_num * (dice_side + 1) // 2,
+                }
+            )
+            classified = True
+
+        if self.DROP_PATTERN.search(sentence):
+            for flag, pattern in self.DROP_FLAGS:
+                if pattern.search(sentence):
+                    abilities.drops.append({"flag": flag})
+            classified = True
+
+        return classified or self.IGNORED_PATTERNS.search(sentence) is not None
+
+    def find_items(self, sentence: str, pattern: re.Pattern) -> List[str]:
+        """patternの直前に列挙されている項目を取り出す"""
+        items = []
+        pos = 0
+        for m in pattern.finditer(sentence):
+            head = self.strip_list_start(sentence[pos : m.start()])
+            items.extend(
+                item.strip() for item in self.ITEM_SEPARATOR.split(head) if item.strip()
+            )
+            pos = m.end()
+        return items
+
+    def strip_list_start(self, text: str) -> str:
+        text = self.CLAUSE_BREAK.split(text)[-1]
+        m: Optional[re.Match] = self.LIST_START.match(text)
+        return text[m.end() :].strip() if m else text.strip()
@@ -1,25 +1,124 @@
+import codecs
 import hashlib
-from typing import List
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 import aiohttp
 import aiosqlite
 
+import DBConnectionPool
+import HttpCache
+import IngestWorkerPool
 import MonsterInfoReader
+from MonsterQuery import MonsterQuery
+from RevisionProbe import RevisionProbe
+from utils import Record
+
+
+@dataclass(frozen=True, slots=True)
+class MonsterRecord(Record):
+    """検索・一覧表示用にメモリに保持するモンスター情報"""
+
+    id: int
+    name: str
+    english_name: str
+    is_unique: int
+    symbol: str
+    # 数値として読み込めなかった項目はNone
+    level: Optional[int]
+    rarity: Optional[int]
+    speed: Optional[int]
+    hp: str
+    ac: Optional[int]
+    exp: Optional[int]
 
 
 class MonsterInfo:
     """モンスター情報クラス"""
 
-    def __init__(self, db_path: str):
+    @dataclass
+    class UpdateSummary:
+        """モンスター情報の更新内容"""
+
+        inserted: List[int] = field(default_factory=list)
+        updated: List[int] = field(default_factory=list)
+        deleted: List[int] = field(default_factory=list)
+        # モンスター詳細のうち、能力の抽出時に分類できなかった文の数
+        unclassified: int = 0
+
+        @property
+        def changed_ids(self) -> List[int]:
+            return sorted(self.inserted + self.updated + self.deleted)
+
+    SCHEMA_VERSION = 4
+    COLUMNS = [
+        "id",
+        "name",
+        "english_name",
+        "is_unique",
+        "symbol",
+        "level",
+        "rarity",
+        "speed",
+        "hp",
+        "hp_value",
+        "ac",
+        "exp",
+        "detail",
+        "content_hash",
+    ]
+    # 条件検索用のインデックスを作成するカラム
+    # 先頭のカラム以外も含めることで、条件検索がインデックスのみで完結する
+    QUERY_COLUMNS = [
+        "level",
+        "speed",
+        "hp_value",
+        "exp",
+        "is_unique",
+        "ac",
+        "rarity",
+        "symbol",
+    ]
+    QUERY_INDEXED_COLUMNS = ["level", "speed", "hp_value", "exp", "is_unique"]
+    # モンスター詳細から抽出した能力を格納するテーブル
+    # テーブル名: (MonsterAbilitiesの属性名, mon_id以外のカラム)
+    ABILITY_TABLES = {
+        "mon_blows": ("blows", ["blow_index", "method", "dice", "damage_avg"]),
+        "mon_spells": ("spells", ["kind", "name"]),
+        "mon_resists": ("resists", ["kind", "element"]),
+        "mon_drops": ("drops", ["flag"]),
+    }
+    CHUNK_SIZE = 64 * 1024
+    INSERT_BATCH_SIZE = 100
+
+    def __init__(
+        self,
+        db_path: str,
+        revision_probe: Optional[RevisionProbe] = None,
+        http_cache: Optional[HttpCache.HttpCache] = None,
+    ):
         """モンスター情報クラスのインスタンスを生成する
 
         Args:
             db_path (str): モンスター情報を格納するDBのパス
+            revision_probe (Optional[RevisionProbe], optional):
+                モンスター情報スポイラーのリビジョンの問い合わせ先。
+                Noneの場合は etag のみで更新を確認する. Defaults to None.
+            http_cache (Optional[HttpCache.HttpCache], optional):
+                etag を保存するキャッシュ. Defaults to None.
         """
         self.db_path = db_path
-        self.etag = ""
+        self.http_cache = http_cache or HttpCache.get_cache()
+        self.revision_probe = revision_probe
+        # 最後に更新を確認した時のリビジョン
+        self.revision: Optional[str] = None
+        self.pool = DBConnectionPool.get_pool(db_path)
+        self.ingest_pool = IngestWorkerPool.get_pool()
 
-    async def get_monster_info_list(self) -> List[dict]:
+    async def get_monster_info_list(self) -> List[MonsterRecord]:
         """モンスター情報のリストを取得する
 
         モンスターのID、日本語名/英語名、ユニークかどうか、シンボル、
@@ -28,11 +127,10 @@ class MonsterInfo:
         モンスター詳細は容量が大きいため、別途 get_monster_detail() で取得する
 
         Returns:
-            List[dict]: モンスター情報のリスト
+            List[MonsterRecord]: モンスター情報のリスト
         """
 
-        async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = aiosqlite.Row
+        async with self.pool.connection() as conn:
             async with conn.execute(
                 """
 SELECT id, name, english_name, is_unique, symbol, level, rarity, speed, hp, ac, exp
@@ -41,7 +139,7 @@ SELECT id, name, english_name, is_unique, symbol, level, rarity, speed, hp, ac,
             ) as c:
                 mon_info_list = await c.fetchall()
 
-        return [dict(row) for row in mon_info_list]
+        return [MonsterRecord(**row) for row in mon_info_list]
 
     async def get_monster_detail(self, monster_id: int) -> str:
         """モンスターの詳細情報を取得する
@@ -53,7 +151,7 @@ SELECT id, name, english_name, is_unique, symbol, level, rarity, speed, hp, ac,
             str: モンスターの詳細情報を表した文字列
         """
 
-        async with aiosqlite.connect(self.db_path) as conn:
+        async with self.pool.connection() as conn:
             async with conn.execute(
                 "SELECT detail FROM mon_info WHERE id = :id", {"id": monster_id}
             ) as c:
@@ -61,13 +159,145 @@ SELECT id, name, english_name, is_unique, symbol, level, rarity, speed, hp, ac,
 
         return detail[0] if detail else ""
 
-    async def clear_db(self, con: aiosqlite.Connection) -> None:
-        await con.execute("DROP TABLE IF EXISTS mon_info_file_hash")
-        await con.execute("CREATE TABLE mon_info_file_hash(hash TEXT)")
-        await con.execute("DROP TABLE IF EXISTS mon_info")
+    async def query_monster_ids(
+        self, query: MonsterQuery, limit: int, offset: int
+    ) -> Tuple[int, List[int]]:
+        """条件に一致するモンスターのIDを取得する
+
+        Args:
+            query (MonsterQuery): 検索条件
+            limit (int): 取得する最大件数
+            offset (int): 取得を開始する位置
+
+        Returns:
+            Tuple[int, List[int]]: 条件に一致するモンスターの総数と、
+                指定した範囲のモンスターのIDのリスト
+        """
+
+        async with self.pool.connection() as conn:
+            async with conn.execute(
+                f"SELECT COUNT(*) FROM mon_info {query.where_clause}", query.params
+            ) as c:
+                (total,) = await c.fetchone()
+            async with conn.execute(
+                f"""
+SELECT id FROM mon_info
+    {query.where_clause}
+    {query.order_by_clause}
+    LIMIT :limit OFFSET :offset
+""",
+                {**query.params, "limit": limit, "offset": offset},
+            ) as c:
+                ids = [row["id"] for row in await c.fetchall()]
+
+        return (total, ids)
+
+    async def search_monster_detail(
+        self, terms: List[str], limit: int
+    ) -> Tuple[int, List[int]]:
+        """モンスターの名前と詳細情報を全文検索する
+
+        全ての語を含むモンスターを関連度の高い順に返す。
+        trigramトークナイザは3文字未満の語を検索できないため、
+        3文字未満の語は LIKE による部分一致で絞り込む。
+
+        Args:
+            terms (List[str]): 検索する語のリスト
+            limit (int): 取得する最大件数
+
+        Returns:
+            Tuple[int, List[int]]: 一致したモンスターの総数と、
+                関連度の高い順に並べたモンスターのIDのリスト
+        """
+        match_terms = [t for t in terms if len(t) >= 3]
+        like_terms = [t for t in terms if len(t) < 3]
+
+        conditions = []
+        params: Dict[str, object] = {"limit": limit}
+        if match_terms:
+            conditions.append("mon_info_fts MATCH :match")
+            params["match"] = " ".join(
+                '"' + t.replace('"', '""') + '"' for t in match_terms
+            )
+        for i, term in enumerate(like_terms):
+            conditions.append(
+                f"(mon_info.name || mon_info.english_name || mon_info.detail)"
+                f" LIKE :like{i} ESCAPE '\\'"
+            )
+            escaped = re.sub(r"([%_\\])", r"\\\1", term)
+            params[f"like{i}"] = f"%{escaped}%"
+
+        where = " AND ".join(conditions)
+        if match_terms:
+            from_clause = (
+                "mon_info_fts JOIN mon_info ON mon_info.id = mon_info_fts.rowid"
+            )
+            order = "mon_info_fts.rank"
+        else:
+            from_clause = "mon_info"
+            order = "mon_info.level, mon_info.id"
+
+        async with self.pool.connection() as conn:
+            async with conn.execute(
+                f"SELECT COUNT(*) FROM {from_clause} WHERE {where}", params
+            ) as c:
+                (total,) = await c.fetchone()
+            async with conn.execute(
+                f"""
+SELECT mon_info.id FROM {from_clause}
+    WHERE {where}
+    ORDER BY {order}
+    LIMIT :limit
+""",
+                params,
+            ) as c:
+                ids = [row["id"] for row in await c.fetchall()]
+
+        return (total, ids)
+
+    async def get_monster_details(
+        self, monster_ids: Optional[List[int]] = None
+    ) -> Dict[int, str]:
+        """複数のモンスターの詳細情報をまとめて取得する
+
+        Args:
+            monster_ids (Optional[List[int]], optional): 取得するモンスターのIDのリスト。
+                Noneの場合は全モンスターの詳細情報を取得する. Defaults to None.
+
+        Returns:
+            Dict[int, str]: モンスターのIDをキー、詳細情報を値とする辞書
+        """
+
+        sql = "SELECT id, detail FROM mon_info"
+        params: List[int] = []
+        if monster_ids is not None:
+            sql += f" WHERE id IN ({', '.join('?' * len(monster_ids))})"
+            params = list(monster_ids)
+
+        async with self.pool.connection() as conn:
+            async with conn.execute(sql, params) as c:
+                return {row["id"]: row["detail"] for row in await c.fetchall()}
+
+    async def create_tables(self, con: aiosqlite.Connection) -> None:
+        """DBのテーブルを作成する
+
+        スキーマのバージョンが古い場合はテーブルを作り直す。
+        作り直した場合はハッシュ値も消えるため、次の更新で全件が再登録される。
+        """
+        async with con.execute("PRAGMA user_version") as c:
+            (version,) = await c.fetchone()
+        if version != self.SCHEMA_VERSION:
+            await con.execute("DROP TABLE IF EXISTS mon_info_file_hash")
+            await con.execute("DROP TABLE IF EXISTS mon_info_fts")
+            await con.execute("DROP TABLE IF EXISTS mon_info")
+            for table in self.ABILITY_TABLES:
+                await con.execute(f"DROP TABLE IF EXISTS {table}")
+            await con.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+        await con.execute("CREATE TABLE IF NOT EXISTS mon_info_file_hash(hash TEXT)")
         await con.execute(
             """
-CREATE TABLE mon_info(
+CREATE TABLE IF NOT EXISTS mon_info(
     id INTEGER PRIMARY KEY,
     name TEXT,
     english_name TEXT,
@@ -77,10 +307,108 @@ CREATE TABLE mon_info(
     rarity INTEGER,
     speed INTEGER,
     hp TEXT,
+    hp_value INTEGER,
     ac INTEGER,
     exp INTEGER,
-    detail TEXT
+    detail TEXT,
+    content_hash TEXT
 )
+"""
+        )
+        for column in self.QUERY_INDEXED_COLUMNS:
+            columns = [column] + [c for c in self.QUERY_COLUMNS if c != column]
+            await con.execute(
+                f"CREATE INDEX IF NOT EXISTS mon_info_index_{column}"
+                f" ON mon_info({', '.join(columns)})"
+            )
+
+        # モンスター詳細から抽出した能力
+        await con.execute(
+            """
+CREATE TABLE IF NOT EXISTS mon_blows(
+    mon_id INTEGER,
+    blow_index INTEGER,
+    method TEXT,
+    dice TEXT,
+    damage_avg INTEGER
+)
+"""
+        )
+        await con.execute(
+            """
+CREATE TABLE IF NOT EXISTS mon_spells(
+    mon_id INTEGER,
+    kind TEXT,
+    name TEXT
+)
+"""
+        )
+        await con.execute(
+            """
+CREATE TABLE IF NOT EXISTS mon_resists(
+    mon_id INTEGER,
+    kind TEXT,
+    element TEXT
+)
+"""
+        )
+        await con.execute(
+            """
+CREATE TABLE IF NOT EXISTS mon_drops(
+    mon_id INTEGER,
+    flag TEXT
+)
+"""
+        )
+        await con.execute(
+            "CREATE INDEX IF NOT EXISTS mon_blows_index_mon_id ON mon_blows(mon_id)"
+        )
+        await con.execute(
+            "CREATE INDEX IF NOT EXISTS mon_spells_index_kind_name"
+            " ON mon_spells(kind, name, mon_id)"
+        )
+        await con.execute(
+            "CREATE INDEX IF NOT EXISTS mon_spells_index_mon_id ON mon_spells(mon_id)"
+        )
+        await con.execute(
+            "CREATE INDEX IF NOT EXISTS mon_resists_index_kind_element"
+            " ON mon_resists(kind, element, mon_id)"
+        )
+        await con.execute(
+            "CREATE INDEX IF NOT EXISTS mon_resists_index_mon_id"
+            " ON mon_resists(mon_id)"
+        )
+        await con.execute(
+            "CREATE INDEX IF NOT EXISTS mon_drops_index_flag ON mon_drops(flag, mon_id)"
+        )
+        await con.execute(
+            "CREATE INDEX IF NOT EXISTS mon_drops_index_mon_id ON mon_drops(mon_id)"
+        )
+
+        # 詳細の全文検索用インデックス
+        # mon_infoの行の追加・削除に連動してトリガーで更新される
+        await con.execute(
+            """
+CREATE VIRTUAL TABLE IF NOT EXISTS mon_info_fts USING fts5(
+    name, english_name, detail,
+    content='mon_info', content_rowid='id', tokenize='trigram'
+)
+"""
+        )
+        await con.execute(
+            """
+CREATE TRIGGER IF NOT EXISTS mon_info_fts_insert AFTER INSERT ON mon_info BEGIN
+    INSERT INTO mon_info_fts(rowid, name, english_name, detail)
+        VALUES (new.id, new.name, new.english_name, new.detail);
+END
+"""
+        )
+        await con.execute(
+            """
+CREATE TRIGGER IF NOT EXISTS mon_info_fts_delete AFTER DELETE ON mon_info BEGIN
+    INSERT INTO mon_info_fts(mon_info_fts, rowid, name, english_name, detail)
+        VALUES ('delete', old.id, old.name, old.english_name, old.detail);
+END
 """
         )
 
@@ -91,8 +419,7 @@ CREATE TABLE mon_info(
             str: 現在保持しているモンスター情報のハッシュ値
         """
         try:
-            async with aiosqlite.connect(self.db_path) as con:
-                con.row_factory = aiosqlite.Row
+            async with self.pool.connection() as con:
                 async with con.execute("SELECT hash FROM mon_info_file_hash") as c:
                     row = await c.fetchone()
         except Exception:
@@ -100,52 +427,207 @@ CREATE TABLE mon_info(
 
         return row["hash"] if row is not None else ""
 
-    async def check_update(self, mon_info_txt_url: str) -> bool:
+    def read_current_mon_info_hash(self) -> str:
+        """現在保持しているモンスター情報のハッシュ値を、コネクションプールを使わずに返す
+
+        イベントループが動き出す前(Cogの生成時)に呼び出すためのもの。
+        DBを読み込み専用で開くので、DBが無ければ作成せずに空文字列を返す。
+
+        Returns:
+            str: 現在保持しているモンスター情報のハッシュ値
+        """
+        try:
+            con = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                row = con.execute("SELECT hash FROM mon_info_file_hash").fetchone()
+            finally:
+                con.close()
+        except sqlite3.Error:
+            return ""
+
+        return row[0] if row is not None else ""
+
+    async def check_update(
+        self, mon_info_txt_url: str
+    ) -> Optional["MonsterInfo.UpdateSummary"]:
         """URLからモンスター詳細スポイラーを取得して、必要ならばDBを更新する
 
+        各モンスターの内容のハッシュ値をDBに保持しているものと比較し、
+        追加・変更・削除されたモンスターのみを更新する。
+        更新は1つのトランザクションで行うため、完了するまで読み込み側からは
+        更新前の内容が見える。
+        スポイラーは受信したチャンク毎にワーカープロセスでパースし、受信中も
+        変更のあったモンスター情報を一時テーブルに書き込んでいく。
+        受信後にファイル全体のハッシュ値が前回と同じだと分かった場合は、
+        書き込んだ内容をロールバックする。
+        リビジョンの問い合わせ先が設定されていて、リビジョンが前回から
+        変わっていなければ、スポイラーは取得しない。
+
         Args:
             mon_info_txt_url (str): モンスター情報スポイラーのURL
 
         Returns:
-            bool: 更新があった場合True、更新が無かった場合False
+            Optional[MonsterInfo.UpdateSummary]: 更新があった場合は更新内容、
+                更新が無かった場合None
         """
 
-        # モンスター詳細スポイラーを指定URLからダウンロード
         async with aiohttp.ClientSession() as client:
-            async with client.get(
-                mon_info_txt_url, headers={"if-none-match": self.etag}
-            ) as res:
+            revision = None
+            if self.revision_probe is not None:
+                revision = await self.revision_probe.fetch(client)
+                if revision is not None and revision == self.revision:
+                    return None
+
+            # DBにモンスター情報が無ければ、検証子は使わずに全体を取得する
+            headers = {}
+            if await self.get_current_mon_info_hash():
+                headers = await self.http_cache.validators(mon_info_txt_url)
+
+            async with client.get(mon_info_txt_url, headers=headers) as res:
+                if res.status == 304:
+                    await self.http_cache.not_modified(mon_info_txt_url)
+                    self.revision = revision
                 if res.status != 200:
-                    return False
+                    return None
 
-                mon_info = await res.text()
+                async with aiosqlite.connect(self.db_path) as con:
+                    await con.execute("PRAGMA journal_mode=WAL")
+                    await con.execute("BEGIN")
+                    await self.create_tables(con)
+                    summary = await self.update_db(
+                        con,
+                        res.content.iter_chunked(self.CHUNK_SIZE),
+                        res.charset or "utf-8",
+                    )
+                    if summary is None:
+                        await con.rollback()
+                    else:
+                        await con.commit()
 
                 # 2度目以降用にレスポンスヘッダのetagを記憶
-                self.etag = res.headers.get("etag", "")
+                await self.http_cache.store(mon_info_txt_url, res.headers)
+                self.revision = revision
+
+        if summary is None:
+            return None
+
+        # 更新内容を反映するため、プールしているコネクションを入れ替える
+        await self.pool.reset()
+
+        return summary
+
+    async def update_db(
+        self, con: aiosqlite.Connection, chunks: AsyncIterator[bytes], encoding: str
+    ) -> Optional["MonsterInfo.UpdateSummary"]:
+        """モンスター詳細スポイラーを読み込み、変更のあったモンスター情報をDBに反映する
+
+        受信したチャンク毎にワーカープロセスでパースし、内容のハッシュ値が
+        保持しているものと異なるモンスター情報を INSERT_BATCH_SIZE 件ずつ
+        一時テーブルに書き込む。受信を終えるまでの間も書き込みを進めるので、
+        メモリに保持するのはチャンクとバッチ1つ分のみとなる。
+        ファイル全体のハッシュ値が保持しているものと同じだった場合は、
+        呼び出し側で書き込みをロールバックする。
+
+        Args:
+            con (aiosqlite.Connection): 更新するDBのコネクション
+            chunks (AsyncIterator[bytes]): モンスター詳細スポイラーのチャンク
+            encoding (str): モンスター詳細スポイラーの文字コード
+
+        Returns:
+            Optional[MonsterInfo.UpdateSummary]: 更新内容。
+                mon-info.txtの内容が保持しているものと同じであればNone
+        """
+        async with con.execute("SELECT hash FROM mon_info_file_hash") as c:
+            row = await c.fetchone()
+        latest_hash = row[0] if row is not None else ""
+        async with con.execute("SELECT id, content_hash FROM mon_info") as c:
+            stored_hashes = {row[0]: row[1] for row in await c.fetchall()}
+
+        for table in ["mon_info", *self.ABILITY_TABLES]:
+            await con.execute(f"DROP TABLE IF EXISTS temp.{table}_shadow")
+            await con.execute(
+                f"CREATE TEMP TABLE {table}_shadow AS SELECT * FROM {table} WHERE 0"
+            )
+
+        md5 = hashlib.md5()
+        decoder = codecs.getincrementaldecoder(encoding)()
+        reader = MonsterInfoReader.MonsterInfoReader()
+        seen_ids: set[int] = set()
+        unclassified = 0
+        batch: List[dict] = []
 
-        # mon-info.txtのMD5キャッシュを計算し、
-        # 保持している内容と同じであれば更新は行わない
-        md5_hash = hashlib.md5(mon_info.encode("utf-8")).hexdigest()
-        latest_hash = await self.get_current_mon_info_hash()
+        async def stage(text: str, final: bool = False) -> None:
+            nonlocal reader, unclassified
+            reader, records = await self.ingest_pool.run(
+                MonsterInfoReader.feed_mon_info_text, reader, text, final
+            )
+            for record in records:
+                seen_ids.add(record["id"])
+                unclassified += record["abilities"].unclassified
+                if stored_hashes.get(record["id"]) != record["content_hash"]:
+                    batch.append(record)
+            if len(batch) >= self.INSERT_BATCH_SIZE or final:
+                await self.insert_shadow_rows(con, batch)
+                batch.clear()
+
+        async for chunk in chunks:
+            md5.update(chunk)
+            await stage(decoder.decode(chunk))
+        await stage(decoder.decode(b"", final=True), final=True)
+
+        if unclassified > 0:
+            getLogger(__name__).warning(
+                f"{unclassified} sentence(s) in monster details could not be classified"
+            )
+
+        # mon-info.txtのMD5ハッシュが保持している内容と同じであれば更新は行わない
+        md5_hash = md5.hexdigest()
         if md5_hash == latest_hash:
-            return False
+            return None
 
-        # DBを更新
-        m = MonsterInfoReader.MonsterInfoReader()
-        async with aiosqlite.connect(self.db_path) as con:
-            await self.clear_db(con)
+        async with con.execute("SELECT id FROM mon_info_shadow") as c:
+            changed_ids = [row[0] for row in await c.fetchall()]
+        summary = MonsterInfo.UpdateSummary(
+            inserted=sorted(i for i in changed_ids if i not in stored_hashes),
+            updated=sorted(i for i in changed_ids if i in stored_hashes),
+            deleted=sorted(stored_hashes.keys() - seen_ids),
+            unclassified=unclassified,
+        )
+
+        removed_ids = [{"id": i} for i in summary.updated + summary.deleted]
+        await con.executemany("DELETE FROM mon_info WHERE id = :id", removed_ids)
+        for table in self.ABILITY_TABLES:
             await con.executemany(
-                """
-INSERT INTO mon_info VALUES(
-    :id, :name, :english_name, :is_unique, :symbol,
-    :level, :rarity, :speed, :hp, :ac, :exp, :detail
-)
-""",
-                m.get_mon_info_list(mon_info),
-            )
-            await con.execute(
-                "INSERT INTO mon_info_file_hash VALUES(:hash)", {"hash": md5_hash}
+                f"DELETE FROM {table} WHERE mon_id = :id", removed_ids
             )
-            await con.commit()
+        for table in ["mon_info", *self.ABILITY_TABLES]:
+            await con.execute(f"INSERT INTO {table} SELECT * FROM {table}_shadow")
+            await con.execute(f"DROP TABLE temp.{table}_shadow")
+        await con.execute("DELETE FROM mon_info_file_hash")
+        await con.execute(
+            "INSERT INTO mon_info_file_hash VALUES(:hash)", {"hash": md5_hash}
+        )
 
-        return True
+        return summary
+
+    async def insert_shadow_rows(
+        self, con: aiosqlite.Connection, records: List[dict]
+    ) -> None:
+        """モンスター情報と抽出した能力を一時テーブルに書き込む"""
+        columns = ", ".join(self.COLUMNS)
+        values = ", ".join(f":{col}" for col in self.COLUMNS)
+        await con.executemany(
+            f"INSERT INTO mon_info_shadow({columns}) VALUES({values})", records
+        )
+        for table, (attr, cols) in self.ABILITY_TABLES.items():
+            ability_columns = ", ".join(["mon_id", *cols])
+            ability_values = ", ".join(f":{col}" for col in ["mon_id", *cols])
+            await con.executemany(
+                f"INSERT INTO {table}_shadow({ability_columns})"
+                f" VALUES({ability_values})",
+                [
+                    {"mon_id": record["id"], **row}
+                    for record in records
+                    for row in getattr(record["abilities"], attr)
+                ],
+            )
@@ -1,6 +1,10 @@
+import hashlib
 import re
 from dataclasses import dataclass
-from typing import Any, List
+from logging import getLogger
+from typing import Any, Iterator, List, Tuple
+
+from MonsterAbilityParser import MonsterAbilityParser
 
 
 @dataclass
@@ -8,9 +12,13 @@ class MonsterInfoReader:
     name_lines: List[str]
     detail_lines: List[str]
     info_line: str
+    pending_text: str
+
+    ability_parser = MonsterAbilityParser()
 
     def __init__(self):
         self.clear()
+        self.pending_text = ""
 
     def clear(self):
         self.name_lines = []
@@ -28,16 +36,71 @@ class MonsterInfoReader:
         else:
             self.name_lines.append(line)
 
+    def feed_line(self, line: str) -> Iterator[dict[str, Any]]:
+        if not line:
+            if (result := self.parse()) is not None:
+                yield result
+            self.clear()
+        else:
+            self.push_line(line)
+
     def get_mon_info_list(self, mon_info: str):
         lines = mon_info.splitlines()
 
         for line in lines:
-            if not line:
-                if (result := self.parse()) is not None:
-                    yield result
-                self.clear()
-            else:
-                self.push_line(line)
+            yield from self.feed_line(line)
+
+    def push_text(self, text: str) -> Iterator[dict[str, Any]]:
+        """モンスター詳細スポイラーの断片を読み込む
+
+        ファイルをチャンク毎に読み込んで渡すことを想定している。
+        行の途中で途切れている部分は次の呼び出しまで保持する。
+
+        Args:
+            text (str): モンスター詳細スポイラーの断片
+
+        Yields:
+            dict[str, Any]: 読み込みが完了したモンスター情報
+        """
+        lines = (self.pending_text + text).split("\n")
+        self.pending_text = lines.pop()
+        for line in lines:
+            yield from self.feed_line(line.rstrip("\r"))
+
+    def finish(self) -> Iterator[dict[str, Any]]:
+        """push_text() で保持している最後の行を読み込む"""
+        if self.pending_text:
+            yield from self.feed_line(self.pending_text.rstrip("\r"))
+            self.pending_text = ""
+
+    def content_hash(self) -> str:
+        """読み込んだモンスター情報の内容のハッシュ値を返す"""
+        text = "\n".join([*self.name_lines, self.info_line, *self.detail_lines])
+        return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def hp_value(hp: str) -> int | None:
+        """HPの表記を数値にする
+
+        "35d10" のようなダイス表記の場合は期待値を、固定値の場合はその値を返す。
+        """
+        if m := re.match(r"^(\d+)d(\d+)$", hp):
+            return int(m[1]) * (int(m[2]) + 1) // 2
+        return int(hp) if hp.isdecimal() else None
+
+    @staticmethod
+    def int_value(mon_id: int, field: str, value: str) -> int | None:
+        """数値の項目を数値にする
+
+        "+10" のような符号付きの表記も受け付ける。数値でなければログに
+        出力してNoneを返し、そのモンスターの他の項目は読み込めるようにする。
+        """
+        if re.fullmatch(r"[+-]?\d+", value):
+            return int(value)
+        getLogger(__name__).warning(
+            f"Monster {mon_id}: {field} is not a number: {value!r}"
+        )
+        return None
 
     def parse(self) -> dict[str, Any] | None:
         if not self.has_complete_data():
@@ -56,23 +119,51 @@ class MonsterInfoReader:
 
         # モンスター情報の解析
         m = re.match(
-            r"^=== Num:(\d+)  Lev:(\d+)  Rar:(\d+)  Spd:(.+)  Hp:(.+)  Ac:(\d+)  Exp:(\d+)",  # noqa: E501
+            r"^=== Num:(\d+)  Lev:(\S+)  Rar:(\S+)  Spd:(.+)  Hp:(.+)  Ac:(\S+)  Exp:(\S+)",  # noqa: E501
             self.info_line,
         )
         if m is None:
             return
+        detail = "".join(self.detail_lines)
+        mon_id = int(m[1])
         result = {
-            "id": m[1],
+            "id": mon_id,
             "name": name,
             "english_name": english_name,
             "is_unique": is_unique,
             "symbol": symbol,
-            "level": m[2],
-            "rarity": m[3],
-            "speed": m[4],
+            "level": self.int_value(mon_id, "level", m[2]),
+            "rarity": self.int_value(mon_id, "rarity", m[3]),
+            "speed": self.int_value(mon_id, "speed", m[4]),
             "hp": m[5],
-            "ac": m[6],
-            "exp": m[7],
-            "detail": "".join(self.detail_lines),
+            "hp_value": self.hp_value(m[5]),
+            "ac": self.int_value(mon_id, "ac", m[6]),
+            "exp": self.int_value(mon_id, "exp", m[7]),
+            "detail": detail,
+            "content_hash": self.content_hash(),
+            "abilities": self.ability_parser.parse(detail),
         }
         return result
+
+
+def feed_mon_info_text(
+    reader: MonsterInfoReader, text: str, final: bool = False
+) -> Tuple[MonsterInfoReader, List[dict[str, Any]]]:
+    """モンスター詳細スポイラーの断片を読み込み、読み込みが完了したモンスター情報を返す
+
+    ワーカープロセスで実行することを想定している。読み込み途中の状態は
+    reader に保持されるので、返された reader を次の断片と一緒に渡す。
+
+    Args:
+        reader (MonsterInfoReader): 前回の呼び出しで返された reader
+        text (str): モンスター詳細スポイラーの断片
+        final (bool, optional): 最後の断片の場合はTrue
+
+    Returns:
+        Tuple[MonsterInfoReader, List[dict[str, Any]]]:
+            読み込み途中の状態を保持した reader と、読み込みが完了したモンスター情報
+    """
+    records = list(reader.push_text(text))
+    if final:
+        records += reader.finish()
+    return reader, records
@@ -0,0 +1,139 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+
+class MonsterQueryError(Exception):
+    pass
+
+
+@dataclass
+class MonsterQuery:
+    """モンスターの条件検索クエリ
+
+    "level>=40 unique sort:-speed" のような条件の並びを解析し、
+    mon_info テーブルに対するWHERE句とORDER BY句を組み立てる。
+    """
+
+    # 条件に指定できる項目名とカラム名の対応
+    KEYS = {
+        "level": "level",
+        "lev": "level",
+        "lv": "level",
+        "階層": "level",
+        "speed": "speed",
+        "spd": "speed",
+        "加速": "speed",
+        "hp": "hp_value",
+        "ac": "ac",
+        "exp": "exp",
+        "rarity": "rarity",
+        "rar": "rarity",
+        "レア度": "rarity",
+    }
+    OPERATORS = [">=", "<=", "!=", "=", ">", "<"]
+
+    # 能力の条件に指定できる項目名と、(テーブル, 種別のカラムの値, 名前のカラム)の対応
+    ABILITY_KEYS = {
+        "breath": ("mon_spells", "breath", "name"),
+        "ブレス": ("mon_spells", "breath", "name"),
+        "spell": ("mon_spells", "spell", "name"),
+        "呪文": ("mon_spells", "spell", "name"),
+        "resist": ("mon_resists", "resist", "element"),
+        "耐性": ("mon_resists", "resist", "element"),
+        "immune": ("mon_resists", "immune", "element"),
+        "免疫": ("mon_resists", "immune", "element"),
+        "vulnerable": ("mon_resists", "vulnerable", "element"),
+        "弱点": ("mon_resists", "vulnerable", "element"),
+    }
+
+    conditions: List[str] = field(default_factory=list)
+    params: Dict[str, Any] = field(default_factory=dict)
+    order_by: List[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, tokens: List[str]) -> "MonsterQuery":
+        """条件の並びを解析する
+
+        Args:
+            tokens (List[str]): 条件の並び
+
+        Raises:
+            MonsterQueryError: 解析できない条件が含まれていた場合
+
+        Returns:
+            MonsterQuery: 解析結果
+        """
+        query = cls()
+        for token in tokens:
+            query.add_condition(token)
+        return query
+
+    def add_param(self, value: Any) -> str:
+        name = f"p{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    def add_condition(self, token: str) -> None:
+        lowered = token.lower()
+        if lowered in ("unique", "u", "ユニーク"):
+            self.conditions.append("is_unique = 1")
+            return
+        if lowered in ("!unique", "nonunique", "!u", "!ユニーク"):
+            self.conditions.append("is_unique = 0")
+            return
+
+        key, sep, value = token.partition(":")
+        if sep and key.lower() == "sort":
+            self.add_order(value)
+            return
+        if sep and key.lower() in ("symbol", "sym", "シンボル"):
+            self.conditions.append(f"symbol = {self.add_param(value)}")
+            return
+        if sep and key.lstrip("!").lower() in self.ABILITY_KEYS:
+            self.add_ability_condition(key, value)
+            return
+        if sep and key.lstrip("!").lower() in ("drop", "ドロップ"):
+            negate = "NOT " if key.startswith("!") else ""
+            self.conditions.append(
+                f"{negate}EXISTS (SELECT 1 FROM mon_drops"
+                " WHERE mon_drops.mon_id = mon_info.id"
+                f" AND mon_drops.flag = {self.add_param(value.upper())})"
+            )
+            return
+
+        m = re.match(
+            r"^(\w+?)(" + "|".join(map(re.escape, self.OPERATORS)) + r")([-+]?\d+)$",
+            token,
+        )
+        if m is None or m[1].lower() not in self.KEYS:
+            raise MonsterQueryError(f"条件を解析できません: {token}")
+        column = self.KEYS[m[1].lower()]
+        self.conditions.append(f"{column} {m[2]} {self.add_param(int(m[3]))}")
+
+    def add_ability_condition(self, key: str, value: str) -> None:
+        table, kind, name_column = self.ABILITY_KEYS[key.lstrip("!").lower()]
+        negate = "NOT " if key.startswith("!") else ""
+        self.conditions.append(
+            f"{negate}EXISTS (SELECT 1 FROM {table}"
+            f" WHERE {table}.mon_id = mon_info.id"
+            f" AND {table}.kind = {self.add_param(kind)}"
+            f" AND {table}.{name_column} = {self.add_param(value)})"
+        )
+
+    def add_order(self, value: str) -> None:
+        descending = value.startswith("-")
+        key = value.lstrip("-+").lower()
+        if key not in self.KEYS:
+            raise MonsterQueryError(f"並べ替えの項目が不明です: {value}")
+        self.order_by.append(f"{self.KEYS[key]} {'DESC' if descending else 'ASC'}")
+
+    @property
+    def where_clause(self) -> str:
+        if not self.conditions:
+            return ""
+        return "WHERE " + " AND ".join(self.conditions)
+
+    @property
+    def order_by_clause(self) -> str:
+        return "ORDER BY " + ", ".join([*self.order_by, "level ASC", "id ASC"])
@@ -1,42 +1,117 @@
 import os
+import time
+from logging import getLogger
 
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
 
+import HttpCache
 import ListSearch
 import MonsterInfo
+import Snapshot
 from ErrorCatchingArgumentParser import ErrorCatchingArgumentParser
-from utils import limit_str_length
+from MonsterQuery import MonsterQuery, MonsterQueryError
+from RenderCache import RenderCache
+from RevisionProbe import create_revision_probe
+from SearchIndex import SearchIndex
+from SingleFlight import SingleFlight
+from TextNormalizer import normalize
+from utils import LatencyStats, limit_str_length, page_count
+
+
+def create_monster_info(config: dict) -> MonsterInfo.MonsterInfo:
+    """設定からモンスター情報クラスのインスタンスを生成する
+
+    botと updater.py で同じDBを使うため、両方からこの関数で生成する。
+    """
+    return MonsterInfo.MonsterInfo(
+        os.path.expanduser(config["mon_info_db_path"]),
+        create_revision_probe(config, "mon_info_revision_url"),
+        HttpCache.get_cache(
+            config.get("http_cache_path", HttpCache.DEFAULT_CACHE_PATH)
+        ),
+    )
+
+
+def log_update_summary(summary: MonsterInfo.MonsterInfo.UpdateSummary) -> None:
+    logger = getLogger(__name__)
+    logger.info(
+        f"Monster info updated: inserted={len(summary.inserted)}"
+        f" updated={len(summary.updated)} deleted={len(summary.deleted)}"
+    )
+    logger.debug(f"Changed monster ids: {summary.changed_ids}")
+
+
+def display_values(mon_info: MonsterInfo.MonsterRecord) -> dict:
+    """表示用に、数値として読み込めなかった項目を "?" に置き換えた辞書を返す"""
+    values = {key: mon_info[key] for key in mon_info.keys()}
+    return {key: "?" if value is None else value for key, value in values.items()}
 
 
 class MonsterSpoiler(commands.Cog):
+    QUERY_PAGE_SIZE = 20
+    DETAIL_SEARCH_LIMIT = 10
+    # updater.py が更新する場合に、DBの更新を確認する間隔
+    EXTERNAL_POLL_SECONDS = 10
+    # スナップショットに保存するデータの構造のバージョン
+    SNAPSHOT_VERSION = 1
+
     def __init__(self, bot: commands.Bot, config: dict):
         self.mon_info_url = config["mon_info_url"]
-        self.m_info = MonsterInfo.MonsterInfo(
-            os.path.expanduser(config["mon_info_db_path"])
-        )
+        self.m_info = create_monster_info(config)
+        # Trueの場合は updater.py がDBを更新し、botは読み込みのみ行う
+        self.external_updater = config.get("external_updater", False)
         self.bot = bot
         self.mon_info_list = []
+        self.mon_info_by_id = {}
+        self.search_index = SearchIndex([], "name", "english_name")
+        self.dataset_version = ""
+        self.render_cache: RenderCache[tuple[str, str]] = RenderCache(
+            config.get("render_cache_size", RenderCache.DEFAULT_MAX_SIZE)
+        )
+        self.render_cache_warmup = config.get("render_cache_warmup", False)
+        self.autocomplete_stats = LatencyStats()
+        self.lookups: SingleFlight[ListSearch.SearchResult] = SingleFlight(
+            config.get("lookup_hold_seconds", SingleFlight.DEFAULT_HOLD_SECONDS)
+        )
 
         self.parser = ErrorCatchingArgumentParser(prog="$mon", add_help=False)
         self.parser.add_argument("-e", "--english", action="store_true")
-        self.parser.add_argument("monster_name")
+        self.parser.add_argument("-D", "--detail", action="store_true")
+        self.parser.add_argument("monster_name", nargs="+")
+
+        self.query_parser = ErrorCatchingArgumentParser(prog="$monq", add_help=False)
+        self.query_parser.add_argument("-p", "--page", type=int, default=1)
+        self.query_parser.add_argument("conditions", nargs="+")
+
+        self.snapshot_path = f"{self.m_info.db_path}.snapshot"
+        self.load_snapshot()
 
+        if self.external_updater:
+            self.checker_task.change_interval(
+                seconds=config.get(
+                    "external_updater_poll_seconds", self.EXTERNAL_POLL_SECONDS
+                )
+            )
         self.checker_task.start()
 
-    @commands.command(usage="[-e] monster_name")
+    @commands.command(usage="[-e] [-D] monster_name")
     async def mon(self, ctx: commands.Context, *args):
         """モンスターを検索する
 
         モンスターを名称の一部で検索し、情報を表示します。
         複数のモンスターがヒットした場合は候補を表示し、リアクションにより選択します。
         一件もヒットしなかった場合は、あいまい検索により候補を表示します。
+        名称を「,」か「、」で区切ると、複数のモンスターをまとめて表示します。
 
         positional arguments:
           monster_name          検索するモンスターの名称の一部
 
         optional arguments:
           -e, --english         英語名で検索する
+          -D, --detail          名称と詳細情報を全文検索する
+                                空白で区切った全ての語を含むモンスターを表示する
         """
 
         try:
@@ -45,19 +120,207 @@ class MonsterSpoiler(commands.Cog):
             await ctx.send_help(ctx.command)
             return
 
-        await ListSearch.search(
+        if parse_result.detail:
+            await self.search_detail(ctx, parse_result.monster_name)
+            return
+
+        await self.search_mon_info(
+            ctx, " ".join(parse_result.monster_name), parse_result.english
+        )
+
+    @app_commands.command(name="mon", description="モンスターを検索する")
+    @app_commands.describe(
+        monster_name="検索するモンスターの名称の一部", english="英語名で検索する"
+    )
+    async def mon_slash(
+        self, interaction: discord.Interaction, monster_name: str, english: bool = False
+    ):
+        ctx = await commands.Context.from_interaction(interaction)
+        await self.search_mon_info(ctx, monster_name, english)
+
+    @mon_slash.autocomplete("monster_name")
+    async def mon_slash_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ):
+        return ListSearch.autocomplete(
+            self.search_index,
+            current,
+            bool(interaction.namespace.english),
+            self.autocomplete_stats,
+        )
+
+    async def search_mon_info(
+        self, ctx: commands.Context, monster_name: str, english: bool
+    ):
+        names = ListSearch.split_names(self.search_index, monster_name, english)
+        if len(names) > 1:
+            await self.search_mon_infos(ctx, names, english)
+            return
+
+        # 同じ検索が同時に要求された場合は1回の検索結果を共有する
+        result = await self.lookups.run(
+            ("mon", normalize(monster_name), english, self.dataset_version),
+            lambda: self.resolve_mon_info(monster_name, english),
+        )
+        await ListSearch.reply(ctx, result, self.send_mon_info, self.send_error, None)
+
+    async def resolve_mon_info(
+        self, monster_name: str, english: bool
+    ) -> ListSearch.SearchResult:
+        result = ListSearch.resolve(self.search_index, monster_name, english)
+        if result.found is not None:
+            # 表示内容を組み立ててキャッシュしておき、結果を共有した要求でも使う
+            await self.get_rendered_mon_info(result.found)
+        return result
+
+    async def search_mon_infos(
+        self, ctx: commands.Context, monster_names: list[str], english: bool
+    ):
+        if len(monster_names) > ListSearch.MAX_BATCH_SIZE:
+            await self.send_error(
+                ctx, f"一度に検索できるのは {ListSearch.MAX_BATCH_SIZE} 件までです"
+            )
+            return
+
+        results = [
+            (name, ListSearch.resolve(self.search_index, name, english))
+            for name in monster_names
+        ]
+        await ListSearch.reply_batch(
             ctx,
+            results,
+            self.create_mon_info_embeds,
             self.send_mon_info,
             self.send_error,
             None,
-            self.mon_info_list,
-            parse_result.monster_name,
-            "name",
-            "english_name",
-            parse_result.english,
         )
 
-    async def create_mon_info_embed(self, mon_info: dict):
+    async def search_detail(self, ctx: commands.Context, terms: list[str]):
+        total, ids = await self.m_info.search_monster_detail(
+            terms, self.DETAIL_SEARCH_LIMIT
+        )
+        candidates = [self.mon_info_by_id[i] for i in ids if i in self.mon_info_by_id]
+        if not candidates:
+            await self.send_error(ctx, "一致するモンスターはいません")
+        elif total == 1:
+            await self.send_mon_info(ctx, candidates[0], None)
+        else:
+            view = ListSearch.SelectView(ctx, self.send_mon_info, None)
+            for mon_info in candidates:
+                view.add_item(ListSearch.SelectButton(mon_info, mon_info["name"]))
+            await ctx.reply(
+                f"候補 ({total} 件中 上位 {len(candidates)} 件):",
+                view=view,
+                delete_after=15,
+            )
+
+    @commands.command(usage="[-p PAGE] condition [condition ...]")
+    async def monq(self, ctx: commands.Context, *args):
+        """条件を指定してモンスターを検索する
+
+        条件に一致するモンスターを一覧表示します。
+        例: $monq level>=40 unique sort:-speed
+
+        positional arguments:
+          condition             検索条件。以下の形式で指定する
+                                  項目 演算子 値 (演算子は >=, <=, >, <, =, !=)
+                                    項目: level, speed, hp, ac, exp, rarity
+                                  unique / !unique  ユニークか否か
+                                  symbol:シンボル  シンボルが一致する
+                                  breath:属性      属性のブレスを吐く
+                                  spell:呪文       呪文を唱える
+                                  resist:属性      属性の耐性を持つ
+                                  immune:状態      状態異常を受け付けない
+                                  vulnerable:属性  属性が弱点
+                                  drop:フラグ      DROP_GOOD, DROP_GREAT 等
+                                  (先頭に ! を付けると否定になる)
+                                  sort:項目        項目の昇順に並べ替える
+                                  sort:-項目       項目の降順に並べ替える
+
+        optional arguments:
+          -p PAGE, --page PAGE  表示するページ
+        """
+
+        try:
+            parse_result = self.query_parser.parse_args(args)
+            query = MonsterQuery.parse(parse_result.conditions)
+        except MonsterQueryError as e:
+            await self.send_error(ctx, str(e))
+            return
+        except Exception:
+            await ctx.send_help(ctx.command)
+            return
+
+        page = max(parse_result.page, 1)
+        total, ids = await self.m_info.query_monster_ids(
+            query, self.QUERY_PAGE_SIZE, (page - 1) * self.QUERY_PAGE_SIZE
+        )
+        if total == 0:
+            await self.send_error(ctx, "条件に一致するモンスターはいません")
+            return
+
+        lines = [
+            self.describe_mon_info_summary(self.mon_info_by_id[i])
+            for i in ids
+            if i in self.mon_info_by_id
+        ]
+        embed = discord.Embed(
+            title=f"検索結果: {total} 件"
+            f" ({page}/{page_count(total, self.QUERY_PAGE_SIZE)} ページ)",
+            description=limit_str_length("\n".join(lines), 4096),
+        )
+        await ctx.reply(embed=embed)
+
+    def describe_mon_info_summary(self, mon_info: MonsterInfo.MonsterRecord) -> str:
+        header = "[U] " if mon_info["is_unique"] else ""
+        values = display_values(mon_info)
+        if mon_info["speed"] is not None:
+            values["speed"] = f"{mon_info['speed']:+}"
+        return header + (
+            "{name} / {english_name} ({symbol})"
+            "  階層:{level} 加速:{speed} HP:{hp} Exp:{exp}".format(**values)
+        )
+
+    async def create_mon_info_embed(self, mon_info: MonsterInfo.MonsterRecord):
+        title, description = await self.get_rendered_mon_info(mon_info)
+        return discord.Embed(title=title, description=description)
+
+    async def get_rendered_mon_info(
+        self, mon_info: MonsterInfo.MonsterRecord
+    ) -> tuple[str, str]:
+        version = self.dataset_version
+        rendered = self.render_cache.get(mon_info["id"], version)
+        if rendered is None:
+            detail = await self.m_info.get_monster_detail(mon_info["id"])
+            rendered = self.render_mon_info(mon_info, detail)
+            self.render_cache.put(mon_info["id"], version, rendered)
+        return rendered
+
+    async def create_mon_info_embeds(
+        self, mon_infos: list[dict], _
+    ) -> list[discord.Embed]:
+        return [
+            discord.Embed(title=title, description=description)
+            for title, description in await self.get_rendered_mon_infos(mon_infos)
+        ]
+
+    async def get_rendered_mon_infos(
+        self, mon_infos: list[dict]
+    ) -> list[tuple[str, str]]:
+        version = self.dataset_version
+        rendered = {m["id"]: self.render_cache.get(m["id"], version) for m in mon_infos}
+        missing = [m for m in mon_infos if rendered[m["id"]] is None]
+        if missing:
+            details = await self.m_info.get_monster_details([m["id"] for m in missing])
+            for mon_info in missing:
+                r = self.render_mon_info(mon_info, details.get(mon_info["id"], ""))
+                self.render_cache.put(mon_info["id"], version, r)
+                rendered[mon_info["id"]] = r
+        return [rendered[m["id"]] for m in mon_infos]
+
+    def render_mon_info(
+        self, mon_info: MonsterInfo.MonsterRecord, detail: str
+    ) -> tuple[str, str]:
         header = "[U] " if mon_info["is_unique"] else ""
         title = header + "{name} / {english_name} ({symbol})".format(**mon_info)
         # Discord Embed titleは256文字まで
@@ -66,10 +329,19 @@ class MonsterSpoiler(commands.Cog):
 ID:{id}  階層:{level}  レア度:{rarity}  加速:{speed}  HP:{hp}  AC:{ac}  Exp:{exp}
 
 """.format(
-            **mon_info
+            **display_values(mon_info)
         )
-        description += await self.m_info.get_monster_detail(mon_info["id"])
-        return discord.Embed(title=title, description=description)
+        description += detail
+        return (title, description)
+
+    async def warm_up_render_cache(self):
+        """全モンスターの表示内容を事前に組み立ててキャッシュに格納する"""
+        version = self.dataset_version
+        details = await self.m_info.get_monster_details()
+        self.render_cache.reserve(len(self.mon_info_list))
+        for mon_info in self.mon_info_list:
+            rendered = self.render_mon_info(mon_info, details.get(mon_info["id"], ""))
+            self.render_cache.put(mon_info["id"], version, rendered)
 
     async def send_error(self, ctx: commands.Context, error_msg: str):
         embed = discord.Embed(title=error_msg, color=discord.Color.red())
@@ -78,12 +350,86 @@ ID:{id}  階層:{level}  レア度:{rarity}  加速:{speed}  HP:{hp}  AC:{ac}  E
     async def send_mon_info(self, ctx: commands.Context, mon_info, _):
         await ctx.reply(embed=await self.create_mon_info_embed(mon_info))
 
+    def set_mon_info_list(
+        self,
+        mon_info_list: list[MonsterInfo.MonsterRecord],
+        search_index: SearchIndex,
+        dataset_version: str,
+    ):
+        self.mon_info_list = mon_info_list
+        self.mon_info_by_id = {m["id"]: m for m in mon_info_list}
+        self.search_index = search_index
+        self.dataset_version = dataset_version
+        self.render_cache.clear()
+        self.lookups.clear()
+        if mon_info_list:
+            self.bot.startup.mark_data_ready(__name__)
+
+    def load_snapshot(self):
+        """前回の起動時に保存したスナップショットからモンスター情報を読み込む
+
+        DBからの読み込みと検索インデックスの作成を待たずに検索できるようにする。
+        スナップショットを保存した後にDBが更新されている場合は使わない。
+        """
+        try:
+            snapshot = Snapshot.load(self.snapshot_path, self.SNAPSHOT_VERSION)
+        except OSError as e:
+            getLogger(__name__).warning(f"Failed to load snapshot: {e}")
+            return
+        if snapshot is None:
+            return
+        if snapshot["dataset_version"] != self.m_info.read_current_mon_info_hash():
+            getLogger(__name__).info("Discarding snapshot older than the DB")
+            return
+        search_index: SearchIndex = snapshot["search_index"]
+        self.set_mon_info_list(
+            search_index.items, search_index, snapshot["dataset_version"]
+        )
+        getLogger(__name__).info(
+            f"Loaded {len(self.mon_info_list)} monsters from snapshot"
+        )
+
+    def save_snapshot(self):
+        snapshot = {
+            "dataset_version": self.dataset_version,
+            "search_index": self.search_index,
+        }
+        try:
+            Snapshot.save(self.snapshot_path, snapshot, self.SNAPSHOT_VERSION)
+        except OSError as e:
+            getLogger(__name__).warning(f"Failed to save snapshot: {e}")
+
     @tasks.loop(seconds=300)
     async def checker_task(self):
-        updated = await self.m_info.check_update(self.mon_info_url)
-        if updated or not self.mon_info_list:
-            self.mon_info_list = await self.m_info.get_monster_info_list()
+        logger = getLogger(__name__)
+        logger.debug(f"Monster lookup stats: {self.lookups.stats()}")
+        logger.debug(f"HTTP cache stats: {self.m_info.http_cache.stats()}")
+        start = time.perf_counter()
+        if not self.external_updater:
+            summary = await self.m_info.check_update(self.mon_info_url)
+            if summary is not None:
+                log_update_summary(summary)
+        # DBのモンスター情報のハッシュ値が読み込み済みのものと異なれば読み込み直す
+        version = await self.m_info.get_current_mon_info_hash()
+        if not version or version == self.dataset_version:
+            return
+        if self.external_updater:
+            await self.m_info.pool.reset()
+        mon_info_list = await self.m_info.get_monster_info_list()
+        self.set_mon_info_list(
+            mon_info_list,
+            SearchIndex(mon_info_list, "name", "english_name"),
+            version,
+        )
+        if self.render_cache_warmup:
+            await self.warm_up_render_cache()
+        self.save_snapshot()
+        logger.info(f"Monster info refreshed in {time.perf_counter() - start:.2f}s")
+
+    @checker_task.before_loop
+    async def before_checker_task(self):
+        await self.bot.startup.wait_first_refresh(__name__)
 
 
 async def setup(bot):
-    await bot.add_cog(MonsterSpoiler(bot, bot.ext))
+    await bot.add_cog(MonsterSpoiler(bot, bot.ext_configs[__name__]))
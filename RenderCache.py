@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class RenderCache(Generic[T]):
+    """表示内容のキャッシュ
+
+    (エンティティのID, データセットのバージョン) をキーとし、
+    組み立て済みの表示内容を保持するLRUキャッシュ。
+    データセットが更新されるとバージョンが変わるため、古い内容が使われることはない。
+    """
+
+    DEFAULT_MAX_SIZE = 512
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        """キャッシュのインスタンスを生成する
+
+        Args:
+            max_size (int, optional): 保持する最大件数
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Tuple[Hashable, str], T] = OrderedDict()
+
+    def get(self, entity_id: Hashable, version: str) -> Optional[T]:
+        """キャッシュから表示内容を取得する
+
+        Args:
+            entity_id (Hashable): エンティティのID
+            version (str): データセットのバージョン
+
+        Returns:
+            Optional[T]: キャッシュされた表示内容。無い場合はNone
+        """
+        key = (entity_id, version)
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, entity_id: Hashable, version: str, value: T) -> None:
+        """表示内容をキャッシュに格納する
+
+        Args:
+            entity_id (Hashable): エンティティのID
+            version (str): データセットのバージョン
+            value (T): 表示内容
+        """
+        key = (entity_id, version)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def reserve(self, size: int) -> None:
+        """最大件数が少なくともsize件になるように拡張する
+
+        全エンティティを事前に組み立てる場合に使用する。
+        """
+        self.max_size = max(self.max_size, size)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
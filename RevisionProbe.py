@@ -0,0 +1,75 @@
+from logging import getLogger
+from typing import Optional
+
+import aiohttp
+
+
+class RevisionProbe:
+    """upstream の現在のリビジョンを1回のリクエストで問い合わせる
+
+    URLのテンプレートの {ref} をブランチ名などに置き換えてGETし、
+    レスポンスの本文をリビジョンとみなす。
+    GitHub の commits API に Accept: application/vnd.github.sha を付けて
+    問い合わせるとコミットのSHAのみが返る。リビジョンを書いた小さな
+    マニフェストファイルのURLを指定してもよい。
+    """
+
+    GITHUB_SHA_ACCEPT = "application/vnd.github.sha"
+
+    def __init__(self, url_template: str, accept: Optional[str] = None):
+        """インスタンスを生成する
+
+        Args:
+            url_template (str): 問い合わせ先のURL。{ref} は ref に置き換える
+            accept (Optional[str], optional): Acceptヘッダの値. Defaults to None.
+        """
+        self.url_template = url_template
+        self.headers = {"accept": accept} if accept else {}
+
+    async def fetch(
+        self, session: aiohttp.ClientSession, ref: str = ""
+    ) -> Optional[str]:
+        """現在のリビジョンを返す
+
+        Args:
+            session (aiohttp.ClientSession): リクエストに使用するセッション
+            ref (str, optional): ブランチ名またはタグ名. Defaults to "".
+
+        Returns:
+            Optional[str]: リビジョン。取得できなかった場合はNone
+        """
+        url = self.url_template.format(ref=ref)
+        try:
+            async with session.get(url, headers=self.headers) as res:
+                if res.status != 200:
+                    getLogger(__name__).warning(
+                        f"Revision probe failed: {url} (status {res.status})"
+                    )
+                    return None
+                revision = (await res.text()).strip()
+        except aiohttp.ClientError as e:
+            getLogger(__name__).warning(f"Revision probe failed: {url} ({e})")
+            return None
+
+        return revision or None
+
+
+def create_revision_probe(
+    config: dict, url_key: str = "revision_probe_url"
+) -> Optional[RevisionProbe]:
+    """設定からリビジョンの問い合わせ先を作成する
+
+    Args:
+        config (dict): 拡張機能の設定
+        url_key (str, optional): URLのテンプレートを指定する設定のキー
+
+    Returns:
+        Optional[RevisionProbe]: 設定が無ければNone。この場合、ファイル毎に
+            etag を使って更新を確認する
+    """
+    if (url_template := config.get(url_key)) is None:
+        return None
+    return RevisionProbe(
+        url_template,
+        config.get("revision_probe_accept", RevisionProbe.GITHUB_SHA_ACCEPT),
+    )
@@ -4,7 +4,7 @@ import json
 import os
 from logging import getLogger
 from operator import attrgetter
-from typing import List
+from typing import List, Optional
 
 import aiohttp
 import discord
@@ -12,15 +12,21 @@ import feedparser
 from discord.ext import commands, tasks
 from feedparser.util import FeedParserDict
 
+import HttpCache
+
 
 class RssChecker:
     RECORD_DIR = os.path.expanduser("~/.rss_checker")
 
-    def __init__(self, name: str, url: str):
+    def __init__(self, name: str, url: str, http_cache: HttpCache.HttpCache):
         self.url = url
+        self.http_cache = http_cache
         os.makedirs(self.RECORD_DIR, exist_ok=True)
         self.record_path = os.path.join(self.RECORD_DIR, name) + ".json"
         self.__load_record()
+        # get_new_items() で取得し、通知を終えるまで保存を保留している結果
+        self.pending_result: Optional[HttpCache.FetchResult] = None
+        self.pending_last_updated_time: Optional[float] = None
 
     def __load_record(self):
         try:
@@ -36,10 +42,14 @@ class RssChecker:
     async def get_new_items(
         self, cs: aiohttp.ClientSession, max: int
     ) -> List[FeedParserDict]:
-        async with cs.get(self.url) as res:
-            if res.status != 200:
-                return []
-            body = await res.text()
+        # 前回から変更が無ければ新着は無い
+        # 検証子と最終更新時刻は、新着の通知を終えてから mark_delivered() で保存する
+        result = await self.http_cache.fetch(cs, self.url, defer_store=True)
+        if not result.modified:
+            return []
+        self.pending_result = result
+        self.pending_last_updated_time = None
+        body = result.text
 
         try:
             feed = feedparser.parse(body)
@@ -61,10 +71,22 @@ class RssChecker:
         ]
         if len(new_items) > 0:
             new_items.sort(key=attrgetter("last_updated_time"), reverse=True)
-            self.record["last_updated_time"] = new_items[0].last_updated_time
-            self.__save_record()
+            self.pending_last_updated_time = new_items[0].last_updated_time
         return new_items[:max]
 
+    async def mark_delivered(self):
+        """get_new_items() で返した新着の通知を終えたことを記録する
+
+        通知に失敗した場合は呼び出さないことで、次回も同じ新着を取得させる。
+        """
+        if self.pending_last_updated_time is not None:
+            self.record["last_updated_time"] = self.pending_last_updated_time
+            self.__save_record()
+        if self.pending_result is not None:
+            await self.http_cache.store(self.url, self.pending_result.headers)
+        self.pending_result = None
+        self.pending_last_updated_time = None
+
     def add_last_updated_time(self, d: feedparser.FeedParserDict):
         for i in d.entries:
             i.last_updated_time = datetime.datetime(*i.updated_parsed[:6]).timestamp()
@@ -93,10 +115,13 @@ class HengscoreRssChecker(RssChecker):
 
 class RssCheckCog(commands.Cog):
     def __init__(self, bot: commands.Bot, config: dict):
+        http_cache = HttpCache.get_cache(
+            config.get("http_cache_path", HttpCache.DEFAULT_CACHE_PATH)
+        )
         self.checkers = []  # type: List[RssChecker]
         for feed in config["feeds"]:
             checker_class = feed.get("checker", "RssChecker")
-            checker = eval(checker_class)(feed["name"], feed["url"])
+            checker = eval(checker_class)(feed["name"], feed["url"], http_cache)
             checker.name = feed["name"]
             checker.send_channel_id = feed["channel_id"]
             self.checkers.append(checker)
@@ -117,13 +142,20 @@ class RssCheckCog(commands.Cog):
 
         for checker, new_items in zip(self.checkers, new_items_list):
             channel = self.bot.get_channel(checker.send_channel_id)
-            for item in new_items:
-                await channel.send(embed=checker.build_embed(item))
+            try:
+                for item in new_items:
+                    await channel.send(embed=checker.build_embed(item))
+            except discord.HTTPException as e:
+                getLogger(__name__).warning(f"Failed to deliver {checker.name}: {e}")
+                continue
+            await checker.mark_delivered()
+        self.bot.startup.mark_data_ready(__name__)
 
     @checker_task.before_loop
     async def before_checker_task(self):
         await self.bot.wait_until_ready()
+        await self.bot.startup.wait_first_refresh(__name__)
 
 
 async def setup(bot: commands.Bot):
-    await bot.add_cog(RssCheckCog(bot, bot.ext))
+    await bot.add_cog(RssCheckCog(bot, bot.ext_configs[__name__]))
@@ -0,0 +1,161 @@
+import bisect
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+from SuggestionEngine import SuggestionEngine
+from TextNormalizer import normalize
+
+
+class SearchIndex:
+    """名前検索用のインデックス
+
+    検索対象のリストが更新された時に一度だけ構築し、検索のたびに
+    全件を走査しないようにする。
+    部分一致検索は文字n-gramの転置インデックスで候補を絞り込んでから確認し、
+    完全一致検索は辞書を引くだけで済ませる。
+    あいまい検索は SuggestionEngine で行う。
+    入力補完は名前を並べ替えた配列を二分探索して前方一致する要素を取り出す。
+
+    名前と検索文字列はどちらも TextNormalizer.normalize で正規化してから比較するため、
+    かな・カナや全角・半角、英字の大文字小文字の違いは区別しない。
+    名前の正規化はインデックス構築時に一度だけ行う。
+    """
+
+    NGRAM = 2
+
+    def __init__(self, items: Sequence[dict], name_key: str, ename_key: str):
+        """インデックスを構築する
+
+        Args:
+            items (Sequence[dict]): 検索対象のリスト
+            name_key (str): 名前検索の時に参照する辞書のキー
+            ename_key (str): 英語名検索の時に参照する辞書のキー
+        """
+        self.items = items
+        self.name_key = name_key
+        self.ename_key = ename_key
+
+        self._keys = {
+            False: [normalize(item[name_key]) for item in items],
+            True: [normalize(item[ename_key]) for item in items],
+        }
+        self._postings = {
+            english: self._build_postings(keys) for english, keys in self._keys.items()
+        }
+        self._suggestion_engines = {
+            english: SuggestionEngine(keys) for english, keys in self._keys.items()
+        }
+        # 入力補完用に名前と英語名をまとめて並べ替えた配列
+        self._sorted_keys = sorted(
+            (key, i) for keys in self._keys.values() for i, key in enumerate(keys)
+        )
+        self._sorted_key_strs = [key for key, _ in self._sorted_keys]
+        self._exact: Dict[str, Dict[str, List[int]]] = {}
+        for key in (name_key, ename_key):
+            exact = defaultdict(list)
+            for i, item in enumerate(items):
+                exact[normalize(item.get(key, ""))].append(i)
+            self._exact[key] = dict(exact)
+
+    def _build_postings(self, keys: List[str]) -> Dict[str, List[int]]:
+        postings = defaultdict(list)
+        for i, key in enumerate(keys):
+            for gram in self._grams(key, 1) | self._grams(key, self.NGRAM):
+                postings[gram].append(i)
+        return dict(postings)
+
+    @staticmethod
+    def _grams(text: str, n: int) -> set:
+        return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+    def find(self, search_str: str, english: bool = False) -> List[dict]:
+        """search_strを名前に含む要素を検索する
+
+        Args:
+            search_str (str): 検索する文字列
+            english (bool, optional): 英語名で検索する. Defaults to False.
+
+        Returns:
+            List[dict]: 一致した要素のリスト。元のリストでの順序を保つ
+        """
+        return [
+            self.items[i] for i in self._find_indexes(normalize(search_str), english)
+        ]
+
+    def _find_indexes(self, search_str: str, english: bool) -> List[int]:
+        if not search_str:
+            return list(range(len(self.items)))
+
+        keys = self._keys[english]
+        postings = self._postings[english]
+        grams = self._grams(search_str, min(len(search_str), self.NGRAM))
+        gram_postings = sorted((postings.get(g, []) for g in grams), key=len)
+        if not gram_postings[0]:
+            return []
+
+        candidates = set(gram_postings[0])
+        for p in gram_postings[1:]:
+            candidates.intersection_update(p)
+            if not candidates:
+                return []
+
+        return [i for i in sorted(candidates) if search_str in keys[i]]
+
+    def find_exact(self, key: str, value: str) -> List[dict]:
+        """指定したキーの値がvalueに一致する要素を返す
+
+        Args:
+            key (str): 参照する辞書のキー。name_keyかename_keyのいずれか
+            value (str): 一致させる値。正規化した上で比較する
+
+        Returns:
+            List[dict]: 一致した要素のリスト
+        """
+        return [self.items[i] for i in self._exact[key].get(normalize(value), [])]
+
+    def suggest(self, search_str: str, english: bool = False) -> List[dict]:
+        """search_strに名前が近い要素をあいまい検索により返す
+
+        Args:
+            search_str (str): 検索する文字列
+            english (bool, optional): 英語名で検索する. Defaults to False.
+
+        Returns:
+            List[dict]: 名前が近い順に並べた要素のリスト(最大10件)
+        """
+        indexes = self._suggestion_engines[english].suggest(normalize(search_str))
+        return [self.items[i] for i in indexes]
+
+    def complete(self, prefix: str, limit: int = 25) -> List[dict]:
+        """入力補完の候補を返す
+
+        名前か英語名がprefixで始まる要素を優先し、limit件に満たない場合は
+        名前にprefixを含む要素で補う。
+
+        Args:
+            prefix (str): 入力途中の文字列
+            limit (int, optional): 返す要素の最大数. Defaults to 25.
+
+        Returns:
+            List[dict]: 候補の要素のリスト
+        """
+        prefix = normalize(prefix)
+        indexes: Dict[int, None] = {}
+
+        pos = bisect.bisect_left(self._sorted_key_strs, prefix)
+        while len(indexes) < limit and pos < len(self._sorted_keys):
+            key, i = self._sorted_keys[pos]
+            if not key.startswith(prefix):
+                break
+            indexes.setdefault(i)
+            pos += 1
+
+        for english in (False, True):
+            if len(indexes) >= limit:
+                break
+            for i in self._find_indexes(prefix, english):
+                indexes.setdefault(i)
+                if len(indexes) >= limit:
+                    break
+
+        return [self.items[i] for i in indexes]
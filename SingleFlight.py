@@ -0,0 +1,101 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight(Generic[T]):
+    """実行中の処理と、その結果を待っている要求の数"""
+
+    task: "asyncio.Task[T]"
+    waiters: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """同一キーの処理をまとめて1回だけ実行する
+
+    同じキーの処理が実行中に要求された場合は新たに実行せず、
+    実行中の処理の結果を共有する。
+    また、完了した結果を hold_seconds 秒の間保持し、直後の同じ要求にはそれを返す。
+    処理は独立したタスクで実行するため、要求の1つがキャンセルされても
+    他の要求には影響しない。全ての要求がキャンセルされた場合のみ処理をキャンセルする。
+    """
+
+    DEFAULT_HOLD_SECONDS = 5.0
+
+    def __init__(self, hold_seconds: float = DEFAULT_HOLD_SECONDS):
+        """インスタンスを生成する
+
+        Args:
+            hold_seconds (float, optional): 完了した結果を保持する秒数
+        """
+        self.hold_seconds = hold_seconds
+        self.fresh = 0
+        self.coalesced = 0
+        self.held = 0
+
+        self._in_flight: Dict[Hashable, _Flight[T]] = {}
+        self._results: Dict[Hashable, Tuple[float, T]] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """keyに対応する処理を実行し、結果を返す
+
+        Args:
+            key (Hashable): 処理を識別するキー
+            func (Callable[[], Awaitable[T]]): 処理を行うコルーチン関数
+
+        Returns:
+            T: 処理の結果
+        """
+        now = time.monotonic()
+        if (result := self._results.get(key)) is not None and result[0] > now:
+            self.held += 1
+            return result[1]
+
+        if (flight := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            self.fresh += 1
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._in_flight[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 結果を待つ要求が無くなったので処理をキャンセルする
+                # キャンセル中の処理を後続の要求が待たないよう、すぐに取り除く
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _finish(self, key: Hashable, flight: _Flight[T]) -> None:
+        self._forget(key, flight)
+        task = flight.task
+        if task.cancelled():
+            return
+        # 待っている要求が無い場合に例外が取得されなかった旨の警告が出ないようにする
+        if task.exception() is None:
+            self._hold(key, task.result())
+
+    def _forget(self, key: Hashable, flight: _Flight[T]) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+    def _hold(self, key: Hashable, value: T) -> None:
+        now = time.monotonic()
+        self._results = {k: r for k, r in self._results.items() if r[0] > now}
+        if self.hold_seconds > 0:
+            self._results[key] = (now + self.hold_seconds, value)
+
+    def clear(self) -> None:
+        """保持している結果を破棄する"""
+        self._results.clear()
+
+    def stats(self) -> dict:
+        return {"fresh": self.fresh, "coalesced": self.coalesced, "held": self.held}
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import pickle
+import struct
+from logging import getLogger
+from typing import Any, Optional
+
+# ファイルの先頭に置く識別子
+MAGIC = b"GBSNAP\x00\x00"
+# スナップショットのファイル形式のバージョン
+FORMAT_VERSION = 1
+# MAGIC, ファイル形式のバージョン, データのバージョン, 本体のSHA-256
+_HEADER = struct.Struct("<8sII32s")
+
+
+def save(path: str, data: Any, version: int) -> None:
+    """データをスナップショットとして保存する
+
+    一時ファイルに書き込んでから rename で置き換えるため、書き込み途中の
+    ファイルを読み込むことはない。
+
+    Args:
+        path (str): スナップショットのパス
+        data (Any): 保存するデータ。pickle可能であること
+        version (int): データの構造のバージョン。構造を変えた場合は上げる
+    """
+    body = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, version, hashlib.sha256(body).digest())
+    # botと updater.py が同時に書き込んでも衝突しないよう、一時ファイルはプロセス毎に分ける
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def load(path: str, version: int) -> Optional[Any]:
+    """スナップショットを読み込む
+
+    ファイル形式やデータのバージョンが異なる場合、内容が壊れている場合は
+    スナップショットを削除してNoneを返す。
+
+    Args:
+        path (str): スナップショットのパス
+        version (int): 期待するデータの構造のバージョン
+
+    Returns:
+        Optional[Any]: 保存したデータ。読み込めなかった場合はNone
+    """
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+
+    reason = None
+    if len(content) < _HEADER.size:
+        reason = "truncated"
+    else:
+        magic, format_version, data_version, digest = _HEADER.unpack_from(content)
+        body = memoryview(content)[_HEADER.size :]
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            reason = "unknown format"
+        elif data_version != version:
+            reason = f"outdated (version {data_version})"
+        elif hashlib.sha256(body).digest() != digest:
+            reason = "checksum mismatch"
+        else:
+            try:
+                return pickle.loads(body)
+            except Exception as e:
+                reason = f"unpickling failed ({e})"
+
+    getLogger(__name__).warning(f"Discarding snapshot {path}: {reason}")
+    os.remove(path)
+    return None
@@ -4,12 +4,16 @@ import aiohttp
 import discord
 from discord.ext import commands
 
+import HttpCache
 from ErrorCatchingArgumentParser import ErrorCatchingArgumentParser
 
 
 class SourceCodeLister(commands.Cog):
     def __init__(self, bot: commands.Bot, config: dict):
         self.src_url = config["src_url"]
+        self.http_cache = HttpCache.get_cache(
+            config.get("http_cache_path", HttpCache.DEFAULT_CACHE_PATH)
+        )
 
         self.parser = ErrorCatchingArgumentParser(prog="srclist", add_help=False)
         self.parser.add_argument("filepath")
@@ -41,11 +45,14 @@ class SourceCodeLister(commands.Cog):
             return
 
         async with aiohttp.ClientSession() as session:
-            async with session.get(self.src_url + parse_result.filepath) as res:
-                if res.status != 200:
-                    await self.send_error(ctx, "ソースファイルが見つかりません")
-                    return
-                src = await res.text()
+            # 同じファイルは保存しておいた内容を使い、変更があった時のみ取得する
+            result = await self.http_cache.fetch(
+                session, self.src_url + parse_result.filepath, keep_body=True
+            )
+        if result.text is None:
+            await self.send_error(ctx, "ソースファイルが見つかりません")
+            return
+        src = result.text
 
         display_lines = [
             f"{i:4}  {l}"
@@ -87,4 +94,4 @@ class SourceCodeLister(commands.Cog):
 
 
 async def setup(bot):
-    await bot.add_cog(SourceCodeLister(bot, bot.ext))
+    await bot.add_cog(SourceCodeLister(bot, bot.ext_configs[__name__]))
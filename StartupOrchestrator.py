@@ -0,0 +1,122 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Dict, Optional
+
+
+@dataclass
+class ExtensionTiming:
+    """拡張機能の起動にかかった時間(秒)"""
+
+    # モジュール(と依存するモジュール)のインポート
+    imported: Optional[float] = None
+    # setup() の実行(Cogの生成)
+    constructed: Optional[float] = None
+    # 起動からデータを検索できるようになるまで
+    data_ready: Optional[float] = None
+    # 起動から最初のコマンドの応答を終えるまで
+    first_command: Optional[float] = None
+
+
+class StartupOrchestrator:
+    """botの起動処理の順序を調整し、かかった時間を記録する
+
+    各拡張機能の最初の更新(ダウンロードやDBの作成)は、全ての拡張機能の読み込みが
+    終わるまで待たせ、さらに一斉に始まらないよう少しずつずらして開始させる。
+    起動時の各段階にかかった時間は拡張機能毎に記録し、ログに出力する。
+    """
+
+    DEFAULT_STAGGER_SECONDS = 2.0
+
+    def __init__(self, stagger_seconds: float = DEFAULT_STAGGER_SECONDS):
+        """インスタンスを生成する
+
+        Args:
+            stagger_seconds (float, optional): 拡張機能毎に最初の更新をずらす秒数
+        """
+        self.stagger_seconds = stagger_seconds
+        self.started = time.perf_counter()
+        self.timings: Dict[str, ExtensionTiming] = {}
+        self._loaded = asyncio.Event()
+        self._next_slot = 0
+        # 最初の更新を待っていて、まだデータが準備できていない拡張機能
+        self._waiting_data: set[str] = set()
+        self._reported_first_command = False
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def timing(self, name: str) -> ExtensionTiming:
+        return self.timings.setdefault(name, ExtensionTiming())
+
+    def set_loaded(self) -> None:
+        """全ての拡張機能の読み込みが終わったことを通知し、最初の更新を開始させる"""
+        self._loaded.set()
+
+    async def wait_first_refresh(self, name: str) -> None:
+        """拡張機能の最初の更新を開始してよくなるまで待つ
+
+        定期的な更新を行うタスクの before_loop から呼び出す。
+
+        Args:
+            name (str): 拡張機能の名前
+        """
+        if self.timing(name).data_ready is None:
+            self._waiting_data.add(name)
+        await self._loaded.wait()
+        slot = self._next_slot
+        self._next_slot += 1
+        await asyncio.sleep(slot * self.stagger_seconds)
+
+    def mark_data_ready(self, name: str) -> None:
+        """拡張機能のデータを検索できるようになったことを記録する
+
+        最初の1回のみ記録し、2回目以降の呼び出しは無視する。
+        最初の更新を待っていた全ての拡張機能のデータが準備できたら、
+        起動にかかった時間をログに出力する。
+
+        Args:
+            name (str): 拡張機能の名前
+        """
+        timing = self.timing(name)
+        if timing.data_ready is not None:
+            return
+        timing.data_ready = self.elapsed()
+        if name in self._waiting_data:
+            self._waiting_data.discard(name)
+            if not self._waiting_data:
+                self.log_report("all data ready")
+
+    def mark_command_served(self, name: str, command: str) -> None:
+        """拡張機能のコマンドに応答したことを記録する
+
+        最初の1回のみ記録する。bot全体で最初のコマンドの場合は、
+        起動にかかった時間をログに出力する。
+
+        Args:
+            name (str): コマンドを持つ拡張機能の名前
+            command (str): コマンドの名前
+        """
+        timing = self.timing(name)
+        if timing.first_command is not None:
+            return
+        timing.first_command = self.elapsed()
+        if not self._reported_first_command:
+            self._reported_first_command = True
+            self.log_report(f"first command served ({command})")
+
+    def log_report(self, event: str) -> None:
+        def fmt(value: Optional[float]) -> str:
+            return f"{value:>8.2f}" if value is not None else f"{'-':>8}"
+
+        lines = [
+            f"Startup timing at {event}, {self.elapsed():.2f}s after start:",
+            f"  {'extension':<20}{'import':>8}{'setup':>8}{'data':>8}{'command':>8}",
+        ]
+        for name, t in self.timings.items():
+            lines.append(
+                f"  {name:<20}{fmt(t.imported)}{fmt(t.constructed)}"
+                f"{fmt(t.data_ready)}{fmt(t.first_command)}"
+            )
+        getLogger(__name__).info("\n".join(lines))
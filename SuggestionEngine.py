@@ -0,0 +1,91 @@
+import heapq
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Tuple
+
+from fuzzywuzzy import fuzz
+
+
+class SuggestionEngine:
+    """あいまい検索による候補の提示を行うクラス
+
+    全要素に fuzz.partial_ratio を計算して並べ替える代わりに、
+    文字の重なりから求めたスコアの上限値で候補を絞り込み、
+    上位になり得る要素だけを実際に採点する。
+
+    partial_ratio のスコアは、短い方の文字列の長さを L、2つの文字列で
+    共通する文字の数(重複を含む)を C とすると 2C/(L+C) を超えない。
+    上限値の高い順に採点し、上限値が採点済みの上位 limit 件の最低点を
+    下回った時点で打ち切るため、結果は全件を採点した場合と同じになる。
+    """
+
+    CACHE_SIZE = 256
+
+    def __init__(self, keys: List[str]):
+        """候補の提示を行うインスタンスを生成する
+
+        Args:
+            keys (List[str]): 比較対象の文字列のリスト。呼び出し側で正規化しておく
+        """
+        self.keys = keys
+        self._char_postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for i, key in enumerate(keys):
+            for ch, count in Counter(key).items():
+                self._char_postings[ch].append((i, count))
+        self._cache: OrderedDict[Tuple[str, int], List[int]] = OrderedDict()
+
+    def __getstate__(self):
+        # スナップショットには検索結果のキャッシュを含めない
+        return {**self.__dict__, "_cache": OrderedDict()}
+
+    def suggest(self, query: str, limit: int = 10) -> List[int]:
+        """queryに近い要素を返す
+
+        Args:
+            query (str): 検索する文字列。呼び出し側で正規化しておく
+            limit (int, optional): 返す要素の最大数. Defaults to 10.
+
+        Returns:
+            List[int]: partial_ratioのスコアが高い順に並べた要素のインデックス。
+                同点の場合は元のリストでの順序に従う
+        """
+        cache_key = (query, limit)
+        if (cached := self._cache.get(cache_key)) is not None:
+            self._cache.move_to_end(cache_key)
+            return cached
+
+        result = self._suggest(query, limit)
+
+        self._cache[cache_key] = result
+        while len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+
+    def _suggest(self, query: str, limit: int) -> List[int]:
+        overlap = [0] * len(self.keys)
+        for ch, query_count in Counter(query).items():
+            for i, count in self._char_postings.get(ch, []):
+                overlap[i] += min(query_count, count)
+
+        def upper_bound(i: int) -> int:
+            if overlap[i] == 0:
+                return 0
+            shorter = min(len(query), len(self.keys[i]))
+            return round(100 * 2 * overlap[i] / (shorter + overlap[i]))
+
+        bounds = [(upper_bound(i), i) for i in range(len(self.keys))]
+        bounds.sort(key=lambda b: (-b[0], b[1]))
+
+        # (スコア, -インデックス) の最小ヒープで上位limit件を保持する
+        # 先頭は現時点で最も順位の低い要素
+        top: List[Tuple[int, int]] = []
+        for bound, i in bounds:
+            if len(top) == limit and bound < top[0][0]:
+                break
+            score = fuzz.partial_ratio(query, self.keys[i]) if bound > 0 else 0
+            entry = (score, -i)
+            if len(top) < limit:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+
+        return [-neg_i for _, neg_i in sorted(top, reverse=True)]
@@ -0,0 +1,27 @@
+import unicodedata
+
+# カタカナ(ァ〜ヶ)をひらがなに変換するテーブル
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+# 検索時に無視する文字(長音記号、中黒、括弧)
+_IGNORED_CHARS = {ord(ch): None for ch in "ー・『』「」"}
+
+
+def normalize(text: str) -> str:
+    """検索用に文字列を正規化する
+
+    名前の表記揺れを吸収するため、以下の変換を行う。
+
+    - 全角英数字・半角カナを NFKC により通常の文字にそろえる
+    - 英字を小文字にする
+    - カタカナをひらがなにする
+    - 長音記号、中黒、『』「」を取り除く
+
+    Args:
+        text (str): 正規化する文字列
+
+    Returns:
+        str: 正規化した文字列
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return text.translate(_KATAKANA_TO_HIRAGANA).translate(_IGNORED_CHARS)
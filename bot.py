@@ -1,25 +1,80 @@
 import asyncio
+import importlib
 import logging
 import os
+import time
+from typing import Dict
 
 import discord
 import yaml
+from discord import app_commands
 from discord.ext import commands
 
+import DBConnectionPool
+import IngestWorkerPool
+from StartupOrchestrator import StartupOrchestrator
+
 
 class Bot(commands.Bot):
     def __init__(self, command_prefix, *, intents: discord.Intents, bot_config: dict):
         super().__init__(command_prefix, intents=intents)
         self.bot_config = bot_config
+        # 拡張機能の設定。各拡張機能の setup() は自身のモジュール名(__name__)で参照する
+        self.ext_configs: Dict[str, dict] = {
+            ext["name"]: ext
+            for ext in bot_config.get("extensions", [])
+            if ext.get("name") is not None
+        }
+        self.startup = StartupOrchestrator(
+            bot_config.get(
+                "startup_stagger_seconds", StartupOrchestrator.DEFAULT_STAGGER_SECONDS
+            )
+        )
 
     async def setup_hook(self):
-        for ext in self.bot_config.get("extensions", []):
-            if (extension_name := ext.get("name")) is None:
-                continue
-            if logging_level := ext.get("logging_level"):
-                logging.getLogger(extension_name).setLevel(logging_level)
-            self.ext = ext
-            await self.load_extension(extension_name)
+        # 拡張機能は互いに独立しているので、まとめて読み込む
+        await asyncio.gather(
+            *[self.load_configured_extension(ext) for ext in self.ext_configs.values()]
+        )
+        self.startup.set_loaded()
+
+        # スラッシュコマンドの登録はレート制限があるため、設定で有効にした時のみ行う
+        if self.bot_config.get("sync_app_commands", False):
+            await self.tree.sync()
+
+    async def load_configured_extension(self, ext: dict):
+        extension_name = ext["name"]
+        if logging_level := ext.get("logging_level"):
+            logging.getLogger(extension_name).setLevel(logging_level)
+        timing = self.startup.timing(extension_name)
+
+        # 依存するモジュールのインポートを別スレッドで済ませておく
+        # load_extension() は拡張機能のモジュール自体を実行し直すが、
+        # 依存するモジュールはインポート済みのものが使われる
+        start = time.perf_counter()
+        await asyncio.to_thread(importlib.import_module, extension_name)
+        timing.imported = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await self.load_extension(extension_name)
+        timing.constructed = time.perf_counter() - start
+
+    async def close(self):
+        await super().close()
+        # プールしているDBコネクションのスレッドが残っているとプロセスが終了しないので、
+        # ワーカープロセスとあわせて終了させる
+        await DBConnectionPool.release_all_pools()
+        IngestWorkerPool.get_pool().shutdown()
+
+    async def on_command_completion(self, ctx: commands.Context):
+        self.startup.mark_command_served(
+            ctx.command.callback.__module__, ctx.command.qualified_name
+        )
+
+    async def on_app_command_completion(
+        self, interaction: discord.Interaction, command: app_commands.Command
+    ):
+        self.startup.mark_command_served(command.module, command.qualified_name)
 
 
 async def main():
@@ -36,7 +91,9 @@ async def main():
         intents=intents,
         bot_config=bot_config,
     )
-    await bot.start(bot_config["token"])
+    # Ctrl+C などで中断された場合も close() が呼ばれるようにする
+    async with bot:
+        await bot.start(bot_config["token"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+"""Jsonc.parse_jsonc と json5.loads のパース時間を比較する
+
+    python tests/bench_jsonc.py [jsoncファイル ...]
+
+ファイルを指定しない場合は、upstream の ArtifactDefinitions.jsonc と同程度の
+大きさ(約1MB)のデータを生成して比較する。json5 は遅いので1回だけ計測する。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import json5
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Jsonc import parse_jsonc  # noqa: E402
+from tests.jsonc_fixture import generate_artifact_definitions  # noqa: E402
+
+
+def measure(func, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="jsoncのパース時間を比較する")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("-n", "--count", type=int, default=2500)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.files:
+        inputs = []
+        for path in args.files:
+            with open(path, "r", encoding="utf-8") as f:
+                inputs.append((path, f.read()))
+    else:
+        inputs = [
+            (f"generated({args.count})", generate_artifact_definitions(args.count))
+        ]
+
+    for name, text in inputs:
+        jsonc_time = measure(parse_jsonc, text, args.repeat)
+        json5_time = measure(json5.loads, text, 1)
+        same = parse_jsonc(text) == json5.loads(text)
+        print(
+            f"{name}: {len(text.encode('utf-8')) / 1024:.0f}KiB"
+            f" parse_jsonc={jsonc_time:.3f}s json5={json5_time:.3f}s"
+            f" x{json5_time / jsonc_time:.0f} identical={same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""メモリに保持するカタログの1件あたりのメモリ使用量を比較する
+
+    python tests/bench_records.py [-n 件数]
+
+同じ内容のモンスター情報・アーティファクト情報を、DBから読み込んでいた頃の
+辞書と、slots を使ったレコードクラスで生成し、tracemalloc で計測する。
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ArtifactSpoiler import ArtifactRecord  # noqa: E402
+from MonsterInfo import MonsterRecord  # noqa: E402
+
+
+def monster_fields(i: int) -> dict:
+    return {
+        "id": i,
+        "name": f"モンスター{i}",
+        "english_name": f"Monster {i}",
+        "is_unique": i % 5 == 0,
+        "symbol": "p",
+        "level": i % 128,
+        "rarity": i % 10,
+        "speed": 110 + i % 30,
+        "hp": f"{i % 50}d10",
+        "ac": i % 200,
+        "exp": i * 3,
+    }
+
+
+def artifact_fields(i: int) -> dict:
+    return {
+        "id": i,
+        "fullname": f"『アーティファクト{i}』",
+        "fullname_en": f"Artifact {i}",
+        "flag_mask": (1 << (i % 120)) | (1 << (i % 37)),
+        "tval": 23,
+        "weight": i * 10,
+        "pval": i % 5,
+        "to_hit": i % 20,
+        "to_dam": i % 25,
+        "to_ac": i % 30,
+    }
+
+
+def measure(create: Callable[[dict], object], fields: List[dict]) -> float:
+    """fieldsからレコードを生成し、1件あたりのバイト数を返す
+
+    文字列などフィールドの値はどちらの形式でも同じものを参照するので、
+    値は先に生成しておき、レコード自体の大きさだけを計測する。
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [create(f) for f in fields]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return (after - before) / len(fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レコードのメモリ使用量を比較する")
+    parser.add_argument("-n", "--count", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, create_fields, record_class in [
+        ("monster", monster_fields, MonsterRecord),
+        ("artifact", artifact_fields, ArtifactRecord),
+    ]:
+        fields = [create_fields(i) for i in range(args.count)]
+        as_dict = measure(dict, fields)
+        as_record = measure(lambda f: record_class(**f), fields)
+        print(
+            f"{name}: dict={as_dict:.0f}B record={as_record:.0f}B"
+            f" per entity ({args.count} entities)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import json
+
+
+def generate_artifact_definitions(count: int) -> str:
+    """ArtifactDefinitions.jsonc を模したjsonc形式の文字列を生成する
+
+    コメント、文字列中の // や /* */、URL、エスケープされた引用符、
+    末尾のカンマを含む、upstream のファイルと同じ規模のデータを作る。
+
+    Args:
+        count (int): アーティファクトの数。upstream は約300件(約1MB)
+
+    Returns:
+        str: jsonc形式の文字列
+    """
+    lines = [
+        "/*",
+        " * 固定アーティファクト定義 ** 生成されたテスト用データ **",
+        " */",
+        "{",
+        '  "version": "1.0", // ファイルのバージョン',
+        '  "artifacts": [',
+    ]
+    for i in range(1, count + 1):
+        name = json.dumps(f"『テスト{i}』", ensure_ascii=False)
+        lines += [
+            f"    // {i} 番目のアーティファクト",
+            "    {",
+            f'      "id": {i},',
+            f'      "name": {{ "ja": {name}, "en": "Test \\"{i}\\"" }},',
+            f'      "url": "https://example.com/artifacts//{i}?q=/*x*/",',
+            '      "base_item": { "type_value": 23, "subtype_value": 1, },',
+            f'      "level": {i % 100}, "rarity": {i % 7}, "weight": {i * 10},',
+            '      /* "cost": 0, */ "cost": 12345,',
+            '      "flags": [ "RES_COLD", "SPEED", /* 末尾のカンマ */ "FULL_NAME", ],',
+            '      "description": "//で始まる説明, カンマ], や } を含む\\\\",',
+            "    },",
+        ]
+    lines += ["  ],", "}", ""]
+    return "\n".join(lines)
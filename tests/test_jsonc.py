@@ -0,0 +1,57 @@
+import json
+
+import json5
+import pytest
+
+from Jsonc import parse_jsonc, strip_jsonc
+from tests.jsonc_fixture import generate_artifact_definitions
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        # 文字列中のコメント記号は削除しない
+        '{"a": "/* not a comment */", "b": "// nor this"}',
+        # URL中の //
+        '{"url": "https://example.com//path"} // コメント',
+        # エスケープされた引用符の後の //
+        '{"a": "quote \\" // still string", "b": "\\\\"} // comment',
+        # 行コメントとブロックコメント
+        '// head\n{/* a */"a": 1, // b\n "b": /* ** */ 2}',
+        # 複数行のブロックコメントと、* を含むブロックコメント
+        '{"a": 1 /* line1\n * line2 **/, "b": [1, 2]}',
+        # 末尾のカンマ
+        '{"a": [1, 2, 3,], "b": {"c": 1,},}',
+        # 末尾のカンマと閉じ括弧の間の空白・コメント
+        '{"a": [1, 2, // c\n /* d */ ], "b": {"c": 1, /* e */\n},}',
+        # 文字列中のカンマと閉じ括弧
+        '{"a": "x,]", "b": ",}",}',
+    ],
+)
+def test_parse_jsonc_matches_json5(text):
+    assert parse_jsonc(text) == json5.loads(text)
+    # jsonの構文に変換できていること(json5へのフォールバックで一致したのではないこと)
+    assert json.loads(strip_jsonc(text)) == json5.loads(text)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "{unquoted: 1}",
+        "{'single': 'quote'}",
+        '{"hex": 0x1F, "inf": Infinity}',
+        '{"a": .5, "b": +1}',
+    ],
+)
+def test_parse_jsonc_falls_back_to_json5(text):
+    with pytest.raises(ValueError):
+        json.loads(strip_jsonc(text))
+    assert parse_jsonc(text) == json5.loads(text)
+
+
+def test_parse_jsonc_matches_json5_on_artifact_definitions():
+    text = generate_artifact_definitions(50)
+    result = parse_jsonc(text)
+    assert result == json5.loads(text)
+    assert len(result["artifacts"]) == 50
+    assert result["artifacts"][0]["url"] == "https://example.com/artifacts//1?q=/*x*/"
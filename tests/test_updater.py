@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+
+from aiohttp import web
+
+import ArtifactSpoiler
+import DBConnectionPool
+import IngestWorkerPool
+from tests.jsonc_fixture import generate_artifact_definitions
+from updater import Updater
+
+BASEITEM_DEFINITIONS = json.dumps(
+    {
+        "baseitems": [
+            {
+                "id": 1,
+                "name": {"ja": "ロング・ソード", "en": "Long Sword"},
+                "itemkind": {"type_value": 23, "subtype_value": 1},
+                "parameter_value": 0,
+            }
+        ]
+    },
+    ensure_ascii=False,
+)
+
+ACTIVATION_INFO_TABLE = (
+    '{ "BR_FIRE", 0, 10, 250, 0, 0, _("火炎のブレス", "breathe fire") },\n'
+)
+
+
+def generate_mon_info(count: int) -> str:
+    """mon-info.txt を模したモンスター詳細スポイラーを生成する"""
+    lines = []
+    for i in range(1, count + 1):
+        lines += [
+            f"モンスター{i}/Monster {i} (p)",
+            f"=== Num:{i}  Lev:{i}  Rar:1  Spd:+{i}  Hp:{i}d10  Ac:{i}  Exp:{i * 3}",
+            "それは火炎のブレスを吐く。それは毒への耐性を持っている。",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def create_app(files: dict, statuses: list) -> web.Application:
+    """files のパスと本文を、etagを付けて返すアプリケーションを作成する"""
+
+    async def handle(request: web.Request) -> web.Response:
+        body = files.get(request.match_info["path"])
+        if body is None:
+            statuses.append(404)
+            return web.Response(status=404)
+        etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            statuses.append(304)
+            return web.Response(status=304)
+        statuses.append(200)
+        return web.Response(text=body, headers={"etag": etag}, charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", handle)
+    return app
+
+
+def read_mon_info_hash(db_path: str) -> str:
+    con = sqlite3.connect(db_path)
+    try:
+        return con.execute("SELECT hash FROM mon_info_file_hash").fetchone()[0]
+    finally:
+        con.close()
+
+
+def test_update_once_builds_dbs_then_revalidates(tmp_path):
+    files = {"mon-info.txt": generate_mon_info(20)}
+    for branch in ArtifactSpoiler.ArtifactSpoilerCog.BRANCHES:
+        files[f"{branch}/lib/edit/ArtifactDefinitions.jsonc"] = (
+            generate_artifact_definitions(5)
+        )
+        files[f"{branch}/lib/edit/BaseitemDefinitions.jsonc"] = BASEITEM_DEFINITIONS
+        files[f"{branch}/src/object-enchant/activation-info-table.cpp"] = (
+            ACTIVATION_INFO_TABLE
+        )
+    statuses: list = []
+
+    async def run():
+        runner = web.AppRunner(create_app(files, statuses))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        http_cache_path = str(tmp_path / "http_cache.db")
+        mon_db_path = str(tmp_path / "mon-info.db")
+        bot_config = {
+            "extensions": [
+                {
+                    "name": "MonsterSpoiler",
+                    "external_updater": True,
+                    "mon_info_url": f"http://127.0.0.1:{port}/mon-info.txt",
+                    "mon_info_db_path": mon_db_path,
+                    "http_cache_path": http_cache_path,
+                },
+                {
+                    "name": "ArtifactSpoiler",
+                    "external_updater": True,
+                    "hengband_src_url": f"http://127.0.0.1:{port}",
+                    "db_dir": str(tmp_path),
+                    "http_cache_path": http_cache_path,
+                },
+            ]
+        }
+        art_spoilers = [
+            ArtifactSpoiler.create_spoiler(bot_config["extensions"][1], branch)
+            for branch in ArtifactSpoiler.ArtifactSpoilerCog.BRANCHES
+        ]
+        try:
+            updater = Updater(bot_config)
+
+            # 初回は全てのファイルを取得してDBを作成する
+            assert all(s.current_db_stamp() is None for s in art_spoilers)
+            await updater.update_once()
+            assert 304 not in statuses
+            assert (
+                read_mon_info_hash(mon_db_path)
+                == hashlib.md5(files["mon-info.txt"].encode()).hexdigest()
+            )
+            mon_mtime = os.stat(mon_db_path).st_mtime_ns
+            art_stamps = [s.current_db_stamp() for s in art_spoilers]
+            assert all(stamp is not None for stamp in art_stamps)
+
+            # 2回目は全て 304 Not Modified となり、DBは書き換えない
+            statuses.clear()
+            await updater.update_once()
+            assert statuses and all(status == 304 for status in statuses)
+            assert os.stat(mon_db_path).st_mtime_ns == mon_mtime
+            assert [s.current_db_stamp() for s in art_spoilers] == art_stamps
+
+            # ファイルが変わればDBを作り直す
+            files["mon-info.txt"] = generate_mon_info(21)
+            statuses.clear()
+            await updater.update_once()
+            assert statuses.count(200) == 1
+            assert (
+                read_mon_info_hash(mon_db_path)
+                == hashlib.md5(files["mon-info.txt"].encode()).hexdigest()
+            )
+            assert [s.current_db_stamp() for s in art_spoilers] == art_stamps
+        finally:
+            await DBConnectionPool.release_all_pools()
+            IngestWorkerPool.get_pool().shutdown()
+            await runner.cleanup()
+
+    asyncio.run(run())
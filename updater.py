@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, List
+
+import aiohttp
+import yaml
+
+import ArtifactSpoiler
+import DBConnectionPool
+import MonsterSpoiler
+
+UpdateJob = Callable[[aiohttp.ClientSession], Awaitable[None]]
+
+
+class Updater:
+    """スポイラーのダウンロードとDBの作成をbotとは別のプロセスで行う
+
+    設定ファイルの拡張機能のうち `external_updater: true` を指定したものについて、
+    botの代わりに定期的に更新を確認してDBを作成する。
+    botはDBを読み込み専用で開き、DBが更新されたら読み込み直す。
+    """
+
+    def __init__(self, bot_config: dict):
+        self.jobs: List[UpdateJob] = []
+        for ext in bot_config.get("extensions", []):
+            if not ext.get("external_updater", False):
+                continue
+            name = ext.get("name")
+            if name == "MonsterSpoiler":
+                self.jobs.append(self.create_monster_job(ext))
+            elif name == "ArtifactSpoiler":
+                self.jobs += self.create_artifact_jobs(ext)
+
+    def create_monster_job(self, config: dict) -> UpdateJob:
+        m_info = MonsterSpoiler.create_monster_info(config)
+
+        async def update(_: aiohttp.ClientSession) -> None:
+            start = time.perf_counter()
+            summary = await m_info.check_update(config["mon_info_url"])
+            if summary is not None:
+                MonsterSpoiler.log_update_summary(summary)
+                logging.getLogger(__name__).info(
+                    f"Monster info refreshed in {time.perf_counter() - start:.2f}s"
+                )
+
+        return update
+
+    def create_artifact_jobs(self, config: dict) -> List[UpdateJob]:
+        return [
+            ArtifactSpoiler.create_spoiler(config, branch).check_for_updates
+            for branch in ArtifactSpoiler.ArtifactSpoilerCog.BRANCHES
+        ]
+
+    async def update_once(self) -> None:
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(
+                *[job(session) for job in self.jobs], return_exceptions=True
+            )
+        for result in results:
+            if isinstance(result, Exception):
+                logging.getLogger(__name__).error("Update failed", exc_info=result)
+
+    async def run(self, interval: float) -> None:
+        while True:
+            await self.update_once()
+            await asyncio.sleep(interval)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="スポイラーの更新を行う")
+    parser.add_argument("-c", "--config", default="~/.bot-config.yml")
+    parser.add_argument("-i", "--interval", type=float, default=300)
+    parser.add_argument("--once", action="store_true", help="1回だけ更新して終了する")
+    args = parser.parse_args()
+
+    with open(os.path.expanduser(args.config), "r") as f:
+        bot_config = yaml.full_load(f)
+
+    logging.basicConfig(level=bot_config.get("logging_level", "WARNING"))
+
+    updater = Updater(bot_config)
+    if not updater.jobs:
+        logging.getLogger(__name__).warning(
+            "No extensions are configured with external_updater: true"
+        )
+        return
+
+    try:
+        if args.once:
+            await updater.update_once()
+        else:
+            await updater.run(args.interval)
+    finally:
+        await DBConnectionPool.release_all_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,3 +12,65 @@ def limit_str_length(text: str, max_length: int) -> str:
     if len(text) > max_length:
         return text[: max_length - 3] + "..."
     return text
+
+
+def page_count(total: int, page_size: int) -> int:
+    """total件をpage_size件ずつ表示する場合のページ数を返す(最低1ページ)"""
+    return max((total + page_size - 1) // page_size, 1)
+
+
+class LatencyStats:
+    """処理時間の統計を保持するクラス
+
+    待ち時間や応答時間を記録し、件数・合計・最大・平均を集計する。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """処理時間を記録する
+
+        Args:
+            seconds (float): 記録する処理時間(秒)
+        """
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "mean": self.mean,
+        }
+
+
+class Record:
+    """辞書としても参照できる読み取り専用レコードの基底クラス
+
+    @dataclass(frozen=True, slots=True) を付けたクラスで継承する。
+    インスタンス毎の __dict__ を持たないため、同じ内容の dict よりも小さい。
+    item["name"] や "{name}".format(**item) のように dict を前提とした
+    既存のコードからもそのまま使えるよう、__getitem__, get, keys を提供する。
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self) -> tuple:
+        return self.__slots__